@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 
 import argparse
+import itertools
 import sys
 import timeit
 import statistics
 
-from sudoku import Board, find_one_solution
+from sudoku import Board, find_one_solution, generate_theory, prepare_theory
+from utils import available_backends, get_backend
 
 
 def parse_arguments(argv):
     parser = argparse.ArgumentParser(description='Benchmark your Sudoku solver.')
     parser.add_argument('benchmark', help="Path to the benchmark file with all benchmark instances.")
     parser.add_argument('-n', default=10, type=int, help="Max. number of boards from the benchmark file to test.")
-    return parser.parse_args(argv)
+    parser.add_argument('-b', '--backend', default='auto',
+                        help="The SAT solver to use, as in sudoku.py (default: %(default)s).")
+    parser.add_argument('-t', '--timeout', type=float, default=None, help="Give up on a board after this many seconds.")
+    parser.add_argument('-a', '--all-backends', action='store_true',
+                        help="Run the boards through every available backend and compare their throughput.")
+    parser.add_argument('--no-propagate', dest='propagate', action='store_false',
+                        help="Encode the full theory of each board, without constraint propagation, as in sudoku.py.")
+    args = parser.parse_args(argv)
+    try:
+        get_backend(args.backend)
+    except ValueError as error:
+        parser.error(str(error))
+    return args
 
 
 def read_benchmark_file(file):
@@ -21,15 +35,58 @@ def read_benchmark_file(file):
             yield line.rstrip('\n')
 
 
+def run_boards(boards, backend, timeout, propagate=True):
+    """ Solve every board with the given backend; return the time taken by each board and the
+    number of boards left without a solution (unsolvable, or the solver timed out). """
+    times, unsolved = [], 0
+    for board in boards:
+        start = timeit.default_timer()
+        if find_one_solution(Board(board), verbose=False, backend=backend, timeout=timeout,
+                             propagate=propagate) is None:
+            unsolved += 1
+        times.append(timeit.default_timer() - start)
+    return times, unsolved
+
+
+def print_times(times, unsolved, prefix=''):
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    print(f"{prefix}Runs: {len(times)}, Total time (sec): {sum(times):.3f}, Max: {max(times):.3f},"
+          f" Min: {min(times):.3f}, Avg: {statistics.mean(times):.3f}, stdev: {stdev:.3f}"
+          + (f", Unsolved: {unsolved}" if unsolved else ""))
+
+
+def print_encoding_time(boards, propagate=True):
+    """ Print how long prepare_theory takes per board, which is part of every run above, and
+    with propagate how much of the full theory propagation removes on average. """
+    seconds = timeit.timeit(lambda: [prepare_theory(Board(board), False, propagate) for board in boards], number=1)
+    print(f"Encoding: {1000 * seconds / len(boards):.3f} ms per board")
+    if propagate:
+        full = [len(generate_theory(Board(board), False)[0]) for board in boards]
+        reduced = [prepare_theory(Board(board), False, True) for board in boards]
+        solved = sum(1 for clauses, _, _, _ in reduced if not clauses)
+        print(f"Propagation: {statistics.mean(len(variables) for _, variables, _, _ in reduced):.1f} variables and"
+              f" {statistics.mean(len(clauses or ()) for clauses, _, _, _ in reduced):.1f} clauses left per board"
+              f" (of {Board(boards[0]).size() ** 3} and {statistics.mean(full):.1f}),"
+              f" {solved} boards solved without the SAT solver")
+
+
 def main(argv):
     args = parse_arguments(argv)
-    times = []
-    for i, board in enumerate(read_benchmark_file(args.benchmark), start=1):
-        times.append(timeit.timeit(lambda: find_one_solution(Board(board), verbose=False), number=1))
-        if i == args.n:
-            break
-    print(f"Runs: {args.n}, Total time (sec): {sum(times):.3f}, Max: {max(times):.3f},"
-          f" Min: {min(times):.3f}, Avg: {statistics.mean(times):.3f}, stdev: {statistics.stdev(times):.3f}")
+    boards = list(itertools.islice(read_benchmark_file(args.benchmark), args.n))
+    if not args.all_backends:
+        print_times(*run_boards(boards, args.backend, args.timeout, args.propagate))
+        print_encoding_time(boards, args.propagate)
+        return
+    results = [(backend.name,) + run_boards(boards, backend.name, args.timeout, args.propagate)
+               for backend in available_backends()]
+    width = max(len(name) for name, _, _ in results)
+    for name, times, unsolved in results:
+        print_times(times, unsolved, prefix=f"{name:<{width}}  ")
+    fastest = min(sum(times) for _, times, _ in results)
+    print()
+    for name, times, _ in results:
+        print(f"{name:<{width}}  {len(times) / sum(times):8.1f} boards/sec, {fastest / sum(times):6.2f}x the fastest backend")
+    print_encoding_time(boards, args.propagate)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+""" A small conflict-driven clause learning (CDCL) SAT solver in pure Python.
+
+It runs inside the calling process, so problems that take a SAT solver a few
+milliseconds are not dominated by starting a solver and writing and parsing
+files. It implements the usual CDCL machinery: two watched literals per clause,
+first-UIP clause learning with non-chronological backtracking, VSIDS variable
+activities, phase saving and Luby restarts. Learned clauses are kept for the life
+of the solver, which is fine for problems of the size of a Sudoku.
+
+Clauses are lists of non-zero integers, as in DIMACS: 3 is variable 3 and -3 its
+negation. Internally a literal is coded as 2 * var for a positive and 2 * var + 1
+for a negative literal, so code ^ 1 is its negation.
+"""
+
+import heapq
+import time
+
+RESTART_BASE = 100  # Conflicts in the first run between restarts, scaled by the Luby sequence
+VAR_DECAY = 0.95
+
+
+def luby(i):
+    """ Return the i-th element (starting at 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ... """
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i = i % size
+    return 2 ** exponent
+
+
+def encode(literal):
+    return 2 * literal if literal > 0 else -2 * literal + 1
+
+
+class CDCLSolver(object):
+    """ A CDCL SAT solver. Clauses can be added between calls to solve(), which
+    keeps everything learned so far, so a problem can be solved incrementally. """
+    def __init__(self, clauses=()):
+        self.num_vars = 0
+        self.values = [0, 0]     # Per literal code: 1 if true, -1 if false, 0 if unassigned
+        self.levels = [0]        # Per variable: decision level of its assignment
+        self.reasons = [None]    # Per variable: the clause that implied it, None for decisions
+        self.activity = [0.0]
+        self.phases = [False]    # Per variable: its last value, reused for decisions
+        self.watches = [[], []]  # Per literal code: the clauses watching it
+        self.trail = []
+        self.trail_limits = []   # Where each decision level starts in the trail
+        self.queue_head = 0
+        self.heap = []
+        self.activity_increment = 1.0
+        self.ok = True           # False once the clauses are known to be unsatisfiable
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def copy(self):
+        """ Return an independent solver with the same clauses, learned clauses and activities,
+        e.g. to solve many problems that share most of their clauses without loading those
+        clauses again. The copy starts from decision level 0. """
+        self.cancel_until(0)
+        other = object.__new__(CDCLSolver)
+        other.__dict__.update(self.__dict__)
+        clones = {}
+        for watchers in self.watches:
+            for clause in watchers:
+                if id(clause) not in clones:
+                    clones[id(clause)] = clause[:]
+        other.watches = [[clones[id(clause)] for clause in watchers] for watchers in self.watches]
+        other.reasons = [None if reason is None else clones.get(id(reason), reason) for reason in self.reasons]
+        for name in ['values', 'levels', 'activity', 'phases', 'trail', 'trail_limits', 'heap']:
+            setattr(other, name, getattr(self, name)[:])
+        return other
+
+    def ensure_vars(self, num_vars):
+        """ Make room for variables 1 to num_vars. """
+        for var in range(self.num_vars + 1, num_vars + 1):
+            self.values += [0, 0]
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.activity.append(0.0)
+            self.phases.append(False)
+            self.watches += [[], []]
+            heapq.heappush(self.heap, (0.0, var))
+        self.num_vars = max(self.num_vars, num_vars)
+
+    def add_clause(self, clause):
+        """ Add a clause, given as a list of DIMACS literals. Return False if the
+        clauses have become unsatisfiable. """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        self.ensure_vars(max([abs(literal) for literal in clause] + [0]))
+        codes = []
+        for code in set(encode(literal) for literal in clause):
+            value = self.values[code]
+            if value == 1 or code ^ 1 in codes:
+                return True  # Already satisfied, or a tautology
+            if value == 0:
+                codes.append(code)
+        if not codes:
+            self.ok = False
+        elif len(codes) == 1:
+            self.enqueue(codes[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watches[codes[0]].append(codes)
+            self.watches[codes[1]].append(codes)
+        return self.ok
+
+    def enqueue(self, code, reason):
+        var = code >> 1
+        self.values[code] = 1
+        self.values[code ^ 1] = -1
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.trail.append(code)
+
+    def propagate(self):
+        """ Propagate every assignment on the trail not propagated yet. Return a
+        conflicting clause, or None. A clause watches its first two literals; an
+        implied literal is moved to the front of its reason clause. """
+        values, watches, trail = self.values, self.watches, self.trail
+        while self.queue_head < len(trail):
+            false_code = trail[self.queue_head] ^ 1
+            self.queue_head += 1
+            self.propagations += 1
+            watchers = watches[false_code]
+            watches[false_code] = kept = []
+            for i, clause in enumerate(watchers):
+                if clause[0] == false_code:
+                    clause[0], clause[1] = clause[1], false_code
+                first = clause[0]
+                if values[first] == 1:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != -1:
+                        clause[1], clause[k] = clause[k], false_code
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values[first] == -1:
+                        kept.extend(watchers[i + 1:])
+                        self.queue_head = len(trail)
+                        return clause
+                    self.enqueue(first, clause)
+        return None
+
+    def analyze(self, conflict):
+        """ Return the first-UIP clause learned from a conflict, with the asserting
+        literal first and a literal of the highest remaining level second, and the
+        level to backtrack to. """
+        seen = set()
+        learned = [None]
+        level = len(self.trail_limits)
+        pending = 0
+        code = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in (clause if code is None else clause[1:]):
+                var = other >> 1
+                if var not in seen and self.levels[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.levels[var] >= level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+            while self.trail[index] >> 1 not in seen:
+                index -= 1
+            code = self.trail[index]
+            index -= 1
+            seen.discard(code >> 1)
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[code >> 1]
+        learned[0] = code ^ 1
+        if len(learned) == 1:
+            return learned, 0
+        highest = max(range(1, len(learned)), key=lambda i: self.levels[learned[i] >> 1])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.levels[learned[1] >> 1]
+
+    def bump(self, var):
+        self.activity[var] += self.activity_increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.activity_increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if self.values[2 * v] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[2 * var] == 0:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def cancel_until(self, level):
+        """ Undo every assignment above the given decision level. """
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for code in self.trail[start:]:
+            var = code >> 1
+            self.values[code] = self.values[code ^ 1] = 0
+            self.reasons[var] = None
+            self.phases[var] = not code & 1
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.queue_head = start
+        if len(self.heap) > 4 * self.num_vars:  # Drop the stale entries
+            self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if self.values[2 * v] == 0]
+            heapq.heapify(self.heap)
+
+    def pick_branch_var(self):
+        """ Return the unassigned variable of highest activity, or None if there is none. """
+        while self.heap:
+            var = heapq.heappop(self.heap)[1]
+            if self.values[2 * var] == 0:
+                return var
+        return None
+
+    def solve(self, deadline=None):
+        """ Return True if the clauses added so far are satisfiable, False otherwise.
+        After True, model() holds a satisfying assignment. If time.monotonic() passes
+        deadline before an answer is found, return None. """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+        restarts = 0
+        restart_limit = RESTART_BASE * luby(restarts)
+        conflicts_since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                if deadline is not None and time.monotonic() > deadline:
+                    self.cancel_until(0)
+                    return None
+                learned, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.watches[learned[0]].append(learned)
+                    self.watches[learned[1]].append(learned)
+                    self.enqueue(learned[0], learned)
+                self.activity_increment /= VAR_DECAY
+                if conflicts_since_restart >= restart_limit:
+                    restarts += 1
+                    restart_limit = RESTART_BASE * luby(restarts)
+                    conflicts_since_restart = 0
+                    self.cancel_until(0)
+            else:
+                var = self.pick_branch_var()
+                if var is None:
+                    self.assignment = [self.values[2 * v] == 1 for v in range(self.num_vars + 1)]
+                    return True
+                self.decisions += 1
+                self.trail_limits.append(len(self.trail))
+                self.enqueue(2 * var if self.phases[var] else 2 * var + 1, None)
+
+    def model(self):
+        """ Return the satisfying assignment found by the last successful solve(), as a
+        dictionary mapping each variable to its truth value. """
+        return {var: self.assignment[var] for var in range(1, len(self.assignment))}
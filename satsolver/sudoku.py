@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
 import itertools
 import math
 import sys
+import time
 
-from utils import save_dimacs_cnf, solve
+from utils import ClauseTemplate, SolverResult, TemplateClauses, get_backend
 
 
 def parse_arguments(argv):
@@ -16,7 +18,25 @@ def parse_arguments(argv):
                         help='Do not print any output.')
     parser.add_argument('-c', '--count', action='store_true',
                         help='Count the number of solutions.')
-    return parser.parse_args(argv)
+    parser.add_argument('-m', '--max-count', type=int, default=None,
+                        help='With --count, stop counting after this many solutions.')
+    parser.add_argument('-u', '--unique', action='store_true',
+                        help='Check whether the board has exactly one solution.')
+    parser.add_argument('-b', '--backend', default='auto',
+                        help='The SAT solver to use: minisat, inprocess (a solver running inside this'
+                             ' process), dimacs:COMMAND for any solver printing SAT competition output,'
+                             ' or auto for the first one installed (default: %(default)s).')
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help='Give up on a SAT call after this many seconds.')
+    parser.add_argument('--no-propagate', dest='propagate', action='store_false',
+                        help='Encode the full theory, instead of narrowing down the candidates of every'
+                             ' cell with naked and hidden singles and only encoding the remaining ones.')
+    args = parser.parse_args(argv)
+    try:
+        get_backend(args.backend)
+    except ValueError as error:
+        parser.error(str(error))
+    return args
 
 
 def print_solution(solution):
@@ -28,121 +48,267 @@ def print_solution(solution):
 
 def compute_solution(sat_assignment, variables, size):
     solution = []
-    for x in range(0, 9):
-        for y in range(0, 9):
-            for k in range(1, 10):
-                val = var(x, y, k)
+    for x in range(0, size):
+        for y in range(0, size):
+            for k in range(1, size + 1):
+                val = var(x, y, k, size)
                 # If there's a value on our solution that corresponds to our
-                # "base 9" transformation, then we can know the value of that
+                # "base size" transformation, then we can know the value of that
                 # position of the sudoku.
-                if(sat_assignment[val]):
+                if(sat_assignment.get(val)):
                     solution.append(k)
                     break
     return solution
 
 # This transforms our position (x, y) with value k into one single value.
-def var(x, y, k): 
-    return 81 * x + 9 * y + k
+def var(x, y, k, size):
+    return size * size * x + size * y + k
 
 # We write clauses so there is not such K repeated on every row.
-def check_row(coords, starty, finishy,clauses):
+def check_row(coords, starty, finishy, size, clauses):
     for x , y in coords:
         for s in range(starty, finishy):
             if s > y:
-                for k in range(1,10):
-                    clauses.append([-var(x, y, k), -var(x, s, k)])
+                for k in range(1, size + 1):
+                    clauses.append([-var(x, y, k, size), -var(x, s, k, size)])
 
 # We write clauses so there is not such K repeated on every col.
-def check_col(coords, startx, finishx, clauses):
+def check_col(coords, startx, finishx, size, clauses):
     for x , y in coords:
         for s in range(startx, finishx):
             if s > x:
-                for k in range(1,10):
-                    clauses.append([-var(x, y, k), -var(s, y, k)])
+                for k in range(1, size + 1):
+                    clauses.append([-var(x, y, k, size), -var(s, y, k, size)])
 
-# We write clauses so there is not such K repeated on every 3x3 box.
-def check_box(coords, clauses):
+# We write clauses so there is not such K repeated on every box.
+def check_box(coords, size, clauses):
     for x, y in coords:
         for x_, y_ in coords:
-            for k in range(1, 10):
+            for k in range(1, size + 1):
                 if (x == x_ and y_ > y) or x_ > x:
-                    clauses.append([-var(x, y, k), -var(x_, y_, k)])
+                    clauses.append([-var(x, y, k, size), -var(x_, y_, k, size)])
 
 
-def generate_theory(board, verbose):
-    """ Generate the propositional theory that corresponds to the given board. """
-    size = board.size()
+@functools.lru_cache(maxsize=None)
+def constraint_template(size):
+    """ Return the ClauseTemplate with the rules of Sudoku, which are the same for every board
+    of the given size. It is built once per size; boards only add the unit clauses of their clues. """
+    box = int(math.sqrt(size))
     clauses = []
-    variables = {}
-    
-    for x, y in board.all_coordinates():
-        val = board.value(x, y)
-        if val == 0:
-            clauses.append([var(x, y, z) for z in range(1, 10)]) # We add all possible values
-            for k in range(1, 10): # for every possible value
-                for kp in range(k + 1, 10): 
-                    clauses.append([-var(x, y, k), -var(x, y, kp)]) # Only one value per coord
-        else:
-            clauses.append([var(x, y, val)]) # We add the values we already have on our input
+    for x, y in itertools.product(range(size), repeat=2):
+        clauses.append([var(x, y, z, size) for z in range(1, size + 1)]) # We add all possible values
+        for k in range(1, size + 1): # for every possible value
+            for kp in range(k + 1, size + 1):
+                clauses.append([-var(x, y, k, size), -var(x, y, kp, size)]) # Only one value per coord
 
     # Values cannot be repeated on a same row/column
-    for x in range (0,9):
-        check_row([(x,y) for y in range(0,9)], 0, 9, clauses)
-        check_col([(y,x) for y in range(0,9)], 0, 9, clauses)
+    for x in range(0, size):
+        check_row([(x,y) for y in range(0, size)], 0, size, size, clauses)
+        check_col([(y,x) for y in range(0, size)], 0, size, size, clauses)
 
-   # Values cannot be repeated on a same 3x3 block
-    for x in 0,3,6:
-        for y in 0,3,6:
-             # this is how we move through a 3x3 block
-            check_box([((x + k % 3), (y + k // 3)) for k in range(0, 9)], clauses) 
+   # Values cannot be repeated on a same box
+    for x in range(0, size, box):
+        for y in range(0, size, box):
+             # this is how we move through a box
+            check_box([((x + k % box), (y + k // box)) for k in range(0, size)], size, clauses)
 
+    return ClauseTemplate(literal for clause in clauses for literal in clause + [0])
+
+
+def generate_theory(board, verbose):
+    """ Generate the propositional theory that corresponds to the given board: the cached rules
+    of Sudoku, followed by a unit clause for every value we already have on our input. """
+    size = board.size()
+    variables = {}
+    clues = [[var(x, y, board.value(x, y), size)] for x, y in board.all_coordinates() if board.value(x, y) != 0]
+    return TemplateClauses(constraint_template(size), clues), variables, size
+
+
+def units(size):
+    """ Return the rows, columns and boxes of a board of the given size, as lists of (x, y). """
+    box = int(math.sqrt(size))
+    rows = [[(x, y) for y in range(size)] for x in range(size)]
+    cols = [[(x, y) for x in range(size)] for y in range(size)]
+    boxes = [[(bx + k // box, by + k % box) for k in range(size)]
+             for bx in range(0, size, box) for by in range(0, size, box)]
+    return rows + cols + boxes
+
+
+def propagate_candidates(board):
+    """ Narrow down the values each cell of the board can take, starting from its clues, by
+    repeating two rules until neither changes anything: a cell with a single candidate removes
+    it from every other cell of its row, column and box (naked single), and a value that only
+    one cell of a row, column or box can take is placed there (hidden single).
+    Return a dictionary from each cell (x, y) to its set of candidates; some set is empty if
+    the clues contradict each other. Every solution of the board survives propagation. """
+    size = board.size()
+    candidates = {(x, y): {board.value(x, y)} if board.value(x, y) else set(range(1, size + 1))
+                  for x, y in board.all_coordinates()}
+    all_units = units(size)
+    peers = {cell: set() for cell in candidates}
+    for unit in all_units:
+        for cell in unit:
+            peers[cell].update(unit)
+    for cell in peers:
+        peers[cell].discard(cell)
+    placed = set()
+    changed = True
+    while changed:
+        changed = False
+        for cell, values in candidates.items():
+            if len(values) == 1 and cell not in placed:  # Naked single
+                placed.add(cell)
+                for peer in peers[cell]:
+                    if values <= candidates[peer]:
+                        candidates[peer] -= values
+                        if not candidates[peer]:
+                            return candidates
+                        changed = True
+        for unit in all_units:
+            for k in range(1, size + 1):
+                cells = [cell for cell in unit if k in candidates[cell]]
+                if not cells:
+                    candidates[unit[0]] = set()  # No cell of the unit can take k
+                    return candidates
+                if len(cells) == 1 and len(candidates[cells[0]]) > 1:  # Hidden single
+                    candidates[cells[0]] = {k}
+                    changed = True
+    return candidates
+
+
+def generate_reduced_theory(board, candidates, verbose):
+    """ Generate the theory of the board restricted to the candidates left by propagate_candidates:
+    only the cells with several candidates get variables, and only for those candidates. Every
+    cell takes one of its candidates, and no value is repeated within a cell, row, column or
+    box. Cells fixed by propagation need no clauses, since their values have already been
+    removed from the candidates of their row, column and box. """
+    size = board.size()
+    variables = {}
+    clauses = []
+    open_cells = [cell for cell, values in candidates.items() if len(values) > 1]
+    for x, y in open_cells:
+        values = sorted(candidates[(x, y)])
+        clauses.append([var(x, y, k, size) for k in values])
+        for i, k in enumerate(values):
+            for kp in values[i + 1:]:
+                clauses.append([-var(x, y, k, size), -var(x, y, kp, size)])
+        for k in values:
+            variables[var(x, y, k, size)] = True
+    for unit in units(size):
+        for k in range(1, size + 1):
+            cells = [(x, y) for x, y in unit if len(candidates[(x, y)]) > 1 and k in candidates[(x, y)]]
+            for i, (x, y) in enumerate(cells):
+                for x_, y_ in cells[i + 1:]:
+                    clauses.append([-var(x, y, k, size), -var(x_, y_, k, size)])
+    if verbose:
+        full_clauses = len(generate_theory(board, False)[0])
+        print(f'Propagation removed {size ** 3 - len(variables)} of {size ** 3} variables'
+              f' and {full_clauses - len(clauses)} of {full_clauses} clauses')
     return clauses, variables, size
 
 
-def count_number_solutions(board, verbose=False):
-    count = 0
-    clauses, variables, size = generate_theory(board, verbose)
-    print("Number of solutions:", count_solutions(clauses, variables, size, count, verbose))
-
-# Recursively we count the number of solutions
-def count_solutions(clauses, variables, size, count, verbose):
-    sol = solve_sat_problem(clauses, "theory.cnf", size, variables, verbose)
-    if sol is None:
-        return count
+def known_assignment(candidates, size):
+    """ Return the assignment of the cell-value variables of the cells with a single candidate. """
+    return {var(x, y, k, size): True for (x, y), values in candidates.items() if len(values) == 1 for k in values}
+
+
+def prepare_theory(board, verbose=False, propagate=True):
+    """ Return the clauses to solve for the board, the cell-value variables of its open cells,
+    its size and the assignment of the cells whose value is already known. Without propagate,
+    these are the clauses of generate_theory, the open cells are the empty ones and the known
+    assignment is None. With propagate, the clauses only cover the candidates left by
+    propagate_candidates: there are no clauses if propagation solved the board, and the
+    clauses are None if it found the clues contradictory. """
+    if not propagate:
+        clauses, variables, size = generate_theory(board, verbose)
+        variables = {var(x, y, k, size): True for x, y in board.all_coordinates() if board.value(x, y) == 0
+                     for k in range(1, size + 1)}
+        return clauses, variables, size, None
+    candidates = propagate_candidates(board)
+    if not all(candidates.values()):
+        if verbose:
+            print('Propagation found the clues contradictory')
+        return None, {}, board.size(), {}
+    clauses, variables, size = generate_reduced_theory(board, candidates, verbose)
+    return clauses, variables, size, known_assignment(candidates, size)
+
+
+def count_number_solutions(board, verbose=False, backend='auto', timeout=None, max_count=None, propagate=True):
+    clauses, variables, size, known = prepare_theory(board, verbose, propagate)
+    start = time.monotonic()
+    count, complete = count_solutions(clauses, variables, backend, timeout, max_count)
+    elapsed = time.monotonic() - start
+    print("Number of solutions:", count if complete else f"at least {count}")
+    print(f"Counted in {elapsed:.3f} sec ({count / max(elapsed, 1e-6):.1f} solutions/sec)")
+    return count, complete
+
+
+def check_unique_solution(board, verbose=False, backend='auto', timeout=None, propagate=True):
+    clauses, variables, size, known = prepare_theory(board, verbose, propagate)
+    count, complete = count_solutions(clauses, variables, backend, timeout, max_count=2)
+    if count == 2:
+        print("The board has more than one solution")
+    elif not complete:
+        print("The solver gave no answer")
     else:
-        # If we have found a solution, we negate that solution and add it as a clause and 
-        # launch again the satsolver adding that new clause.
-        neg = negate(sol)
-        if neg not in clauses:
-            clauses.append(neg)
-        else:
-            return count
-        return count_solutions(clauses, variables, size, count + 1, verbose)
-
-# If a clause is "False" we turn it into "True" and if it is "True", we make it "False"
-def negate(clause):
-    neg_clause = []
-    for key in clause:
-        if key != 0:
-            if clause[key]:
-                neg_clause.append(-key)
-            else:
-                neg_clause.append(key)
-    return neg_clause
-
-
-def find_one_solution(board, verbose=False):
-    clauses, variables, size = generate_theory(board, verbose)
-    return solve_sat_problem(clauses, "theory.cnf", size, variables, verbose)
-
-
-def solve_sat_problem(clauses, filename, size, variables, verbose):
-    save_dimacs_cnf(variables, clauses, filename, verbose)
-    result, sat_assignment = solve(filename, verbose)
-    if result != "SAT":
+        print("The board has a unique solution" if count == 1 else "The board has no solution")
+    return count == 1 and complete
+
+
+def count_solutions(clauses, variables, backend='auto', timeout=None, max_count=None):
+    """ Count the solutions of a theory from prepare_theory, stopping once max_count of them (if
+    not None) have been found. Return the count and whether it is complete, i.e. counting did not
+    stop at max_count or because the solver gave no answer.
+    Each solution found is ruled out with a blocking clause, and the same solver session is
+    asked for the next one; the in-process backend keeps everything it learned in between.
+    Blocking clauses only hold the cell-value variables of the open cells (the keys of
+    variables) that are true in the solution: those alone determine the whole board. """
+    if clauses is None:  # Contradictory clues
+        return 0, True
+    if max_count is not None and max_count < 1:
+        return 0, False
+    if not clauses:  # Solved by propagation
+        return 1, True
+    session = get_backend(backend).session(clauses, timeout=timeout)
+    count = 0
+    while max_count is None or count < max_count:
+        result = session.solve()
+        if result.status == "UNSAT":
+            return count, True
+        if result.status != "SAT":
+            return count, False
+        count += 1
+        blocking = [-v for v in variables if result.assignment.get(v)]
+        if not blocking:  # A full board has no other solution
+            return count, True
+        session.add_clause(blocking)
+    return count, False
+
+
+def find_one_solution(board, verbose=False, backend='auto', timeout=None, propagate=True):
+    clauses, variables, size, known = prepare_theory(board, verbose, propagate)
+    if clauses is None:
         if verbose:
             print("The given board is not solvable")
         return None
+    return solve_sat_problem(clauses, "theory.cnf", size, variables, verbose, backend, timeout, known)
+
+
+def solve_sat_problem(clauses, filename, size, variables, verbose, backend='auto', timeout=None, known=None):
+    if not clauses:  # Nothing left to solve
+        result = SolverResult("SAT", {}, 'propagation', 0.0)
+    else:
+        result = get_backend(backend).solve(clauses, filename, verbose, timeout)
+    if result.status != "SAT":
+        if verbose and result.status == "UNSAT":
+            print("The given board is not solvable")
+        elif verbose:
+            print(f"The {result.backend} solver gave no answer")
+        return None
+    sat_assignment = result.assignment
+    if known is not None:  # Only the open cells were encoded: the solver knows nothing of the others
+        sat_assignment = dict(known)
+        sat_assignment.update((v, result.assignment.get(v, False)) for v in variables)
     solution = compute_solution(sat_assignment, variables, size)
     if verbose:
         print_solution(solution)
@@ -190,9 +356,14 @@ def main(argv):
     board = Board(args.board)
 
     if args.count:
-        count_number_solutions(board, verbose=False)
+        count_number_solutions(board, verbose=False, backend=args.backend, timeout=args.timeout,
+                               max_count=args.max_count, propagate=args.propagate)
+    elif args.unique:
+        check_unique_solution(board, verbose=False, backend=args.backend, timeout=args.timeout,
+                              propagate=args.propagate)
     else:
-        find_one_solution(board, verbose=not args.quiet)
+        find_one_solution(board, verbose=not args.quiet, backend=args.backend, timeout=args.timeout,
+                          propagate=args.propagate)
 
 
 if __name__ == "__main__":
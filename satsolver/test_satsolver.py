@@ -0,0 +1,109 @@
+""" Tests for the in-process CDCL solver, solution counting and backend selection.
+Run them with "python3 -m pytest" from this directory. """
+
+import itertools
+import random
+
+import pytest
+
+import utils
+from cdcl import CDCLSolver
+from sudoku import Board, count_solutions, find_one_solution, prepare_theory
+from utils import get_backend
+
+COUNTED_BOARD = "98.7..6..75..4......3..8.7.5....7.3...94.........2.1............9...5.8...52....6"
+UNIQUE_BOARD = "98.7..6..75..4......3..8.7.5....7.3...94.........2.1..3.......1.9...5.8...52....6"
+CONTRADICTORY_BOARD = "55..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79"
+
+
+def random_cnf(rng, num_vars, num_clauses):
+    clauses = []
+    for _ in range(num_clauses):
+        variables = rng.sample(range(1, num_vars + 1), rng.randint(1, min(3, num_vars)))
+        clauses.append([rng.choice([-1, 1]) * var for var in variables])
+    return clauses
+
+
+def satisfies(assignment, clauses):
+    return all(any(assignment[abs(literal)] == (literal > 0) for literal in clause) for clause in clauses)
+
+
+def brute_force_models(clauses, num_vars):
+    models = []
+    for values in itertools.product([False, True], repeat=num_vars):
+        assignment = dict(zip(range(1, num_vars + 1), values))
+        if satisfies(assignment, clauses):
+            models.append(assignment)
+    return models
+
+
+def new_solver(clauses, num_vars):
+    solver = CDCLSolver(clauses)
+    solver.ensure_vars(num_vars)  # Variables that appear in no clause
+    return solver
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_cdcl_agrees_with_brute_force(seed):
+    rng = random.Random(seed)
+    num_vars = rng.randint(1, 8)
+    clauses = random_cnf(rng, num_vars, rng.randint(1, 5 * num_vars))
+    solver = new_solver(clauses, num_vars)
+    satisfiable = bool(brute_force_models(clauses, num_vars))
+    assert solver.solve() == satisfiable
+    if satisfiable:
+        assert satisfies(solver.model(), clauses)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_cdcl_enumerates_every_model(seed):
+    rng = random.Random(seed)
+    num_vars = rng.randint(1, 6)
+    clauses = random_cnf(rng, num_vars, rng.randint(1, 3 * num_vars))
+    solver = new_solver(clauses, num_vars)
+    models = set()
+    while solver.solve():
+        model = solver.model()
+        assert satisfies(model, clauses)
+        models.add(tuple(model[var] for var in range(1, num_vars + 1)))
+        solver.add_clause([-var if value else var for var, value in model.items()])
+    expected = {tuple(model[var] for var in range(1, num_vars + 1))
+                for model in brute_force_models(clauses, num_vars)}
+    assert models == expected
+
+
+@pytest.mark.parametrize('propagate', [True, False])
+def test_count_solutions_of_empty_4x4_board(propagate):
+    clauses, variables, size, known = prepare_theory(Board('.' * 16), propagate=propagate)
+    assert count_solutions(clauses, variables) == (288, True)
+
+
+@pytest.mark.parametrize('propagate', [True, False])
+def test_count_solutions_stops_at_max_count(propagate):
+    clauses, variables, size, known = prepare_theory(Board(COUNTED_BOARD), propagate=propagate)
+    assert count_solutions(clauses, variables, max_count=20) == (20, False)
+
+
+def test_count_solutions_of_unique_board():
+    clauses, variables, size, known = prepare_theory(Board(UNIQUE_BOARD))
+    assert count_solutions(clauses, variables) == (1, True)
+    assert count_solutions(clauses, variables, max_count=1) == (1, False)
+
+
+@pytest.mark.parametrize('propagate', [True, False])
+def test_contradictory_board_has_no_solution(propagate):
+    board = Board(CONTRADICTORY_BOARD)
+    clauses, variables, size, known = prepare_theory(board, propagate=propagate)
+    assert count_solutions(clauses, variables) == (0, True)
+    assert find_one_solution(board, propagate=propagate) is None
+
+
+def test_auto_backend_without_minisat(monkeypatch):
+    monkeypatch.setattr(utils.shutil, 'which', lambda command: None)
+    get_backend.cache_clear()
+    try:
+        assert get_backend('auto').name == 'inprocess'
+        with pytest.raises(ValueError):
+            get_backend('minisat')
+    finally:
+        get_backend.cache_clear()
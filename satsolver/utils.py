@@ -1,6 +1,75 @@
+import abc
+import array
+import collections
+import functools
+import shutil
 import subprocess
 import time
 
+from cdcl import CDCLSolver
+
+# The outcome of a solver run. status is "SAT", "UNSAT" or "UNKNOWN" (the solver timed out
+# or failed), assignment maps variable indexes to their truth values if SAT (and is empty
+# otherwise), backend is the name of the backend and seconds the wall time it took.
+SolverResult = collections.namedtuple('SolverResult', ['status', 'assignment', 'backend', 'seconds'])
+
+# Solvers that follow the output format of the SAT competitions, tried by auto-detection
+COMPETITION_SOLVERS = ['kissat', 'cadical', 'cryptominisat5', 'lingeling', 'picosat']
+
+
+class ClauseTemplate(object):
+    """ A fixed set of clauses shared by many problems, stored as one flat array of literals
+    with a 0 after each clause, as in DIMACS. The clause tuples, the DIMACS text and a CDCL
+    solver loaded with the clauses are built on first use and then reused. """
+    def __init__(self, literals):
+        self.literals = array.array('i', literals)
+        self.num_clauses = self.literals.count(0)
+        self.num_vars = max(map(abs, self.literals), default=0)
+        self._clauses = None
+        self._dimacs_body = None
+        self._solver = None
+
+    @property
+    def clauses(self):
+        if self._clauses is None:
+            clauses, start = [], 0
+            for end, literal in enumerate(self.literals):
+                if literal == 0:
+                    clauses.append(tuple(self.literals[start:end]))
+                    start = end + 1
+            self._clauses = tuple(clauses)
+        return self._clauses
+
+    @property
+    def dimacs_body(self):
+        """ The clauses as DIMACS lines, without the header. """
+        if self._dimacs_body is None:
+            self._dimacs_body = ''.join(print_clause(clause) + '\n' for clause in self.clauses)
+        return self._dimacs_body
+
+    def solver(self):
+        """ Return a new CDCLSolver holding the clauses of the template. """
+        if self._solver is None:
+            self._solver = CDCLSolver(self.clauses)
+        return self._solver.copy()
+
+
+class TemplateClauses(list):
+    """ A list of clauses that starts with the clauses of a ClauseTemplate. Backends use the
+    template to skip work they have done before: writing the DIMACS text of the template
+    clauses, or loading them into a solver. """
+    def __init__(self, template, clauses=()):
+        super().__init__(template.clauses)
+        self.extend(clauses)
+        self.template = template
+
+    def own_clauses(self):
+        """ Return the clauses that follow the template. """
+        return self[self.template.num_clauses:]
+
+    def copy(self):
+        return TemplateClauses(self.template, self.own_clauses())
+
 
 def parse_minisat_output(filename):
     with open(filename, 'r') as f:
@@ -13,27 +82,210 @@ def parse_minisat_output(filename):
         return result, sat_assignment
 
 
+def parse_competition_output(text):
+    """ Parse the output of a solver in the SAT competition format: an "s SATISFIABLE" or
+    "s UNSATISFIABLE" line and, if satisfiable, "v" lines with the literals of a model.
+    Return a tuple <res, assignment> like parse_minisat_output. """
+    result, literals = 'UNKNOWN', []
+    for line in text.splitlines():
+        if line.startswith('s '):
+            result = {'SATISFIABLE': 'SAT', 'UNSATISFIABLE': 'UNSAT'}.get(line[2:].strip(), 'UNKNOWN')
+        elif line.startswith('v '):
+            literals.extend(int(x) for x in line[2:].split())
+    if result != 'SAT':
+        return result, {}
+    return result, {abs(x): x > 0 for x in literals if x != 0}
+
+
+class Backend(abc.ABC):
+    """ A way of running a SAT solver. Subclasses implement available() and run(). """
+    def __init__(self, name):
+        self.name = name
+
+    @abc.abstractmethod
+    def available(self):
+        """ Return True if this backend can run on this machine. """
+
+    @abc.abstractmethod
+    def run(self, clauses, filename, verbose, timeout):
+        """ Solve the clauses and return a tuple <res, assignment>, where res is "SAT",
+        "UNSAT" or "UNKNOWN". filename is where to write the DIMACS file, if one is needed. """
+
+    def solve(self, clauses, filename='theory.cnf', verbose=False, timeout=None):
+        """ Solve the clauses, giving up after timeout seconds (if not None), and return
+        a SolverResult. """
+        start = time.monotonic()
+        result, assignment = self.run(clauses, filename, verbose, timeout)
+        return SolverResult(result, assignment, self.name, time.monotonic() - start)
+
+    def session(self, clauses, filename='theory.cnf', verbose=False, timeout=None):
+        """ Return a Session that solves the clauses, and the clauses added to it later. """
+        return Session(self, clauses, filename, verbose, timeout)
+
+
+class Session(object):
+    """ Solves a growing set of clauses: clauses can be added between calls to solve(),
+    which returns a SolverResult (each call gets timeout seconds). This default runs the
+    backend on all the clauses every time; backends that can do better return their own. """
+    def __init__(self, backend, clauses, filename, verbose, timeout):
+        self.backend = backend
+        self.clauses = clauses.copy() if isinstance(clauses, list) else list(clauses)
+        self.filename = filename
+        self.verbose = verbose
+        self.timeout = timeout
+
+    def add_clause(self, clause):
+        self.clauses.append(clause)
+
+    def solve(self):
+        return self.backend.solve(self.clauses, self.filename, self.verbose, self.timeout)
+
+
+class InProcessSession(Session):
+    """ Keeps one CDCL solver, and everything it has learned, across calls to solve(). """
+    def __init__(self, backend, clauses, filename, verbose, timeout):
+        super().__init__(backend, (), filename, verbose, timeout)
+        if isinstance(clauses, TemplateClauses):
+            self.solver = clauses.template.solver()
+            for clause in clauses.own_clauses():
+                self.solver.add_clause(clause)
+        else:
+            self.solver = CDCLSolver(clauses)
+
+    def add_clause(self, clause):
+        self.solver.add_clause(clause)
+
+    def solve(self):
+        start = time.monotonic()
+        solver = self.solver
+        result = solver.solve(None if self.timeout is None else start + self.timeout)
+        if self.verbose:
+            print(f'In-process solver: {solver.conflicts} conflicts, {solver.decisions} decisions,'
+                  f' {solver.propagations} propagations')
+        if result is None:
+            status, assignment = 'UNKNOWN', {}
+        elif not result:
+            status, assignment = 'UNSAT', {}
+        else:
+            status, assignment = 'SAT', solver.model()
+        return SolverResult(status, assignment, self.backend.name, time.monotonic() - start)
+
+
+class MinisatBackend(Backend):
+    """ Runs the minisat executable, which writes its answer to a file. """
+    def __init__(self, command='minisat'):
+        super().__init__(command)
+        self.command = command
+
+    def available(self):
+        return shutil.which(self.command) is not None
+
+    def run(self, clauses, filename, verbose, timeout):
+        save_dimacs_cnf({}, clauses, filename, verbose)
+        return self.run_file(filename, verbose, timeout)
+
+    def run_file(self, filename, verbose, timeout=None):
+        output = 'solver.output'
+        cmd = [self.command, filename, output]
+        try:
+            if verbose:
+                retcode = subprocess.call(cmd, timeout=timeout)
+            else:  # Redirect the output
+                with open('solver.log', 'w') as stdout:
+                    with open('solver.err', 'w') as stderr:
+                        retcode = subprocess.call(cmd, stdout=stdout, stderr=stderr, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return 'UNKNOWN', {}
+        if retcode not in (10, 20):  # Minisat's exit codes for SAT and UNSAT
+            return 'UNKNOWN', {}
+        return parse_minisat_output(output)
+
+
+class CompetitionBackend(Backend):
+    """ Runs any solver that reads a DIMACS file named on its command line and prints its
+    answer in the SAT competition format ("s SATISFIABLE" and "v" lines). """
+    def __init__(self, command):
+        super().__init__(f'dimacs:{command}')
+        self.command = command
+
+    def available(self):
+        return shutil.which(self.command) is not None
+
+    def run(self, clauses, filename, verbose, timeout):
+        save_dimacs_cnf({}, clauses, filename, verbose)
+        try:
+            completed = subprocess.run([self.command, filename], stdout=subprocess.PIPE,
+                                       stderr=None if verbose else subprocess.DEVNULL,
+                                       universal_newlines=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return 'UNKNOWN', {}
+        if verbose:
+            print(completed.stdout, end='')
+        return parse_competition_output(completed.stdout)
+
+
+class InProcessBackend(Backend):
+    """ Solves the clauses with the CDCL solver of cdcl.py, without files or processes. """
+    def __init__(self):
+        super().__init__('inprocess')
+
+    def available(self):
+        return True
+
+    def run(self, clauses, filename, verbose, timeout):
+        result = self.session(clauses, filename, verbose, timeout).solve()
+        return result.status, result.assignment
+
+    def session(self, clauses, filename='theory.cnf', verbose=False, timeout=None):
+        return InProcessSession(self, clauses, filename, verbose, timeout)
+
+
+BACKENDS = collections.OrderedDict((backend.name, backend) for backend in
+                                   [MinisatBackend()] +
+                                   [CompetitionBackend(command) for command in COMPETITION_SOLVERS] +
+                                   [InProcessBackend()])
+
+
+def available_backends():
+    """ Return the registered backends that can run on this machine, in order of preference. """
+    return [backend for backend in BACKENDS.values() if backend.available()]
+
+
+@functools.lru_cache(maxsize=None)
+def get_backend(name):
+    """ Return the backend with the given name: a name from BACKENDS, "dimacs:COMMAND" for
+    any solver with competition-style output, or "auto" for the first available backend.
+    Raise ValueError if there is no such backend or it is not installed. Backends are looked
+    up once per name and process, so solving many boards does not search the PATH each time. """
+    if name == 'auto':
+        return available_backends()[0]  # The in-process backend is always available
+    if name in BACKENDS:
+        backend = BACKENDS[name]
+    elif name.startswith('dimacs:'):
+        backend = CompetitionBackend(name[len('dimacs:'):])
+    else:
+        raise ValueError(f'Unknown SAT backend "{name}"; choose auto, {", ".join(BACKENDS)} or dimacs:COMMAND')
+    if not backend.available():
+        raise ValueError(f'The SAT backend "{name}" needs {backend.command}, which is not installed')
+    return backend
+
+
 def solve(cnf_filename, verbose):
     """ Invoke the Minisat solver on the given file in DIMACS CNF format.
     Return a tuple <res, assignment>, where res is either "SAT" or "UNSAT",
     and assignment is a dictionary mapping variable indexes to their truth values in
     a satisfying assignment, if SAT, or an empty dictionary, otherwise.
     """
-    output = 'solver.output'
-    cmd = ['minisat', cnf_filename, output]
-
-    if verbose:
-        retcode = subprocess.call(cmd)
-    else:  # Redirect the output
-        with open('solver.log', 'w') as stdout:
-            with open('solver.err', 'w') as stderr:
-                retcode = subprocess.call(cmd, stdout=stdout, stderr=stderr)
-
-    return parse_minisat_output(output)
+    return BACKENDS['minisat'].run_file(cnf_filename, verbose)
 
 
 def save_dimacs_cnf(variables, clauses, filename, verbose):
-    numvars = len(variables)
+    # The text of the clauses of a template is only formatted once
+    template = getattr(clauses, 'template', None)
+    own_clauses = clauses.own_clauses() if template is not None else clauses
+    # The header must cover every variable used, which solvers stricter than minisat check
+    numvars = max([len(variables), template.num_vars if template is not None else 0] +
+                  [abs(literal) for clause in own_clauses for literal in clause])
     numclauses = len(clauses)
 
     if verbose:
@@ -42,7 +294,9 @@ def save_dimacs_cnf(variables, clauses, filename, verbose):
     with open(filename, "w") as output:
         print("c CNF encoding generated on {}".format(time.strftime("%Y%m%d %H:%M:%S", time.localtime())), file=output)
         print(f"p cnf {numvars} {numclauses}", file=output)  # p cnf nbvar nbclauses
-        for clause in clauses:
+        if template is not None:
+            output.write(template.dimacs_body)
+        for clause in own_clauses:
             print(print_clause(clause), file=output)
 
 
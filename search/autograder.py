@@ -13,13 +13,17 @@
 
 
 # imports from python standard library
+import cPickle
+import collections
 import grading
 import imp
 import optparse
 import os
 import re
 import sys
+import traceback
 import projectParams
+import util
 import random
 random.seed(0)
 try: 
@@ -79,6 +83,20 @@ def readCommand(argv):
                     dest = 'noGraphics',
                     action = 'store_true',
                     help = 'No graphics display for pacman games.')
+    parser.add_option('--jobs', '-j',
+                    dest = 'jobs',
+                    type = 'int',
+                    default = 1,
+                    help = 'Run test cases on this many worker processes, without graphics.')
+    parser.add_option('--test-timeout',
+                    dest = 'testTimeout',
+                    type = 'int',
+                    default = 1800,
+                    help = 'Seconds each test case may run with --jobs.')
+    parser.add_option('--maze-cache',
+                    dest = 'mazeCache',
+                    default = None,
+                    help = 'Cache maze distance tables in this directory, so later runs load them.')
     (options, args) = parser.parse_args(argv)
     return options
 
@@ -243,10 +261,112 @@ def getTestSubdirs(testParser, testRoot, questionToGrade):
     return sorted(os.listdir(testRoot))
 
 
+# runs test cases on worker processes; set by ParallelTestRunner.start, and
+# inherited by the workers when they fork
+_parallelRunner = None
+
+def runParallelTestCase(testId):
+    """
+    Runs test case testId, a (question, index) pair, in a worker process.
+    Returns the events recorded on a grading.GradesRecorder, followed by the
+    value of the test case, or by the exception it raised and its traceback.
+    """
+    question, index = testId
+    runner = _parallelRunner
+    recorder = grading.GradesRecorder()
+    stdout, sys.stdout = sys.stdout, recorder
+    try:
+        try:
+            value = util.TimeoutFunction(runner.tests[question][index], runner.testTimeout)(recorder)
+            return recorder.finish(), value, None, None
+        except Exception, inst:
+            lines = traceback.format_exc().split('\n')
+            try:
+                cPickle.dumps(inst, 2)
+            except Exception:
+                inst = Exception(str(inst)) # Keep the message of exceptions that cannot be sent back
+            return recorder.finish(), None, inst, lines
+    finally:
+        sys.stdout = stdout
+
+class ParallelTestRunner:
+    """
+    Runs the test cases of an evaluation on a pool of worker processes.
+
+    The test cases of a question are sent to the workers as soon as every
+    question it depends on has full credit, so questions that do not depend
+    on each other run side by side.  Grading itself stays in this process
+    and in order: each test case thunk waits for its result and replays its
+    messages and points on the Grades object, so the transcript is the same
+    as a serial run.  Each test case gets testTimeout seconds.
+    """
+    def __init__(self, jobs, testTimeout, prereqs):
+        self.jobs = jobs
+        self.testTimeout = testTimeout
+        self.prereqs = prereqs
+        self.questions = []
+        self.tests = {}
+        self.pending = {}
+        self.submitted = set()
+        self.completed = set()
+        self.pool = None
+
+    def addTestCase(self, question, thunk):
+        "Registers the test case thunk of question; returns a thunk that waits for its result"
+        if question not in self.tests:
+            self.questions.append(question)
+            self.tests[question] = []
+        index = len(self.tests[question])
+        self.tests[question].append(thunk)
+        return lambda grades: self.result((question, index), grades)
+
+    def start(self):
+        global _parallelRunner
+        import multiprocessing
+        _parallelRunner = self
+        self.pool = multiprocessing.Pool(self.jobs)
+        self.submitReady()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def submit(self, question):
+        if question in self.submitted:
+            return
+        self.submitted.add(question)
+        for index in range(len(self.tests[question])):
+            testId = (question, index)
+            self.pending[testId] = self.pool.apply_async(runParallelTestCase, [testId])
+
+    def submitReady(self):
+        for question in self.questions:
+            if self.prereqs[question] <= self.completed:
+                self.submit(question)
+
+    def questionFinished(self, question, grades):
+        if grades.points[question] >= grades.maxes[question]:
+            self.completed.add(question)
+            self.submitReady()
+
+    def result(self, testId, grades):
+        self.submit(testId[0])
+        pending = self.pending.pop(testId)
+        while not pending.ready():
+            pending.wait(1) # A timed wait lets the question's timeout signal through
+        events, value, inst, lines = pending.get()
+        grades.replay(events)
+        if inst is not None:
+            inst.workerTraceback = lines
+            raise inst
+        return value
+
 # evaluate student code
 def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MAP,
              edxOutput=False, muteOutput=False, gsOutput=False,
-            printTestCase=False, questionToGrade=None, display=None):
+            printTestCase=False, questionToGrade=None, display=None, jobs=1, testTimeout=1800):
     # imports of testbench code.  note that the testClasses import must follow
     # the import of student code due to dependencies
     import testParser
@@ -257,6 +377,15 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
     questions = []
     questionDicts = {}
     test_subdirs = getTestSubdirs(testParser, testRoot, questionToGrade)
+    runner = None
+    if jobs > 1 and not generateSolutions:
+        prereqs = collections.defaultdict(set)
+        if questionToGrade == None:
+            for q in test_subdirs:
+                configFile = os.path.join(testRoot, q, 'CONFIG')
+                if os.path.exists(configFile):
+                    prereqs[q] = set(testParser.TestParser(configFile).parse().get('depends', '').split())
+        runner = ParallelTestRunner(jobs, testTimeout, prereqs)
     for q in test_subdirs:
         subdir_path = os.path.join(testRoot, q)
         if not os.path.isdir(subdir_path) or q[0] == '.':
@@ -293,12 +422,20 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
                         return lambda grades: printTest(testDict, solutionDict) or testCase.execute(grades, moduleDict, solutionDict)
                     else:
                         return lambda grades: testCase.execute(grades, moduleDict, solutionDict)
-            question.addTestCase(testCase, makefun(testCase, solution_file))
+            thunk = makefun(testCase, solution_file)
+            if runner is not None:
+                thunk = runner.addTestCase(q, thunk)
+            question.addTestCase(testCase, thunk)
 
         # Note extra function is necessary for scoping reasons
-        def makefun(question):
-            return lambda grades: question.execute(grades)
-        setattr(sys.modules[__name__], q, makefun(question))
+        def makefun(question, q):
+            if runner is None:
+                return lambda grades: question.execute(grades)
+            def execute(grades):
+                question.execute(grades)
+                runner.questionFinished(q, grades)
+            return execute
+        setattr(sys.modules[__name__], q, makefun(question, q))
         questions.append((q, question.getMaxPoints()))
 
     grades = grading.Grades(projectParams.PROJECT_NAME, questions,
@@ -308,7 +445,14 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             for prereq in questionDicts[q].get('depends', '').split():
                 grades.addPrereq(q, prereq)
 
-    grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+    if runner is None:
+        grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+    else:
+        runner.start()
+        try:
+            grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+        finally:
+            runner.close()
     return grades.points
 
 
@@ -333,6 +477,9 @@ if __name__ == '__main__':
     options = readCommand(sys.argv)
     if options.generateSolutions:
         confirmGenerate()
+    if options.mazeCache:
+        import mazeDistances
+        mazeDistances.CACHE_DIR = options.mazeCache
     codePaths = options.studentCode.split(',')
     # moduleCodeDict = {}
     # for cp in codePaths:
@@ -355,4 +502,5 @@ if __name__ == '__main__':
         evaluate(options.generateSolutions, options.testRoot, moduleDict,
             gsOutput=options.gsOutput,
             edxOutput=options.edxOutput, muteOutput=options.muteOutput, printTestCase=options.printTestCase,
-            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None, options))
+            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None and options.jobs <= 1, options),
+            jobs=options.jobs, testTimeout=options.testTimeout)
@@ -0,0 +1,244 @@
+# benchmark.py
+# ------------
+# Micro and macro benchmarks for the search code.
+#
+# Usage: python benchmark.py <benchmark> [options]
+#        python benchmark.py priorityQueue -n 20000
+#        python benchmark.py bidirectional
+#        python benchmark.py successors -n 2000
+#        python benchmark.py scaling --kind maze --sizes 15,31,61,121 --csv scaling.csv
+
+
+import cStringIO
+import csv
+import os
+import random
+import sys
+import time
+import timeit
+from optparse import OptionParser
+
+import util
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def timeCall(function, *args):
+    "Returns the wall time in seconds taken by function(*args)"
+    start = timeit.default_timer()
+    function(*args)
+    return timeit.default_timer() - start
+
+#############################
+# Priority queue benchmark  #
+#############################
+
+def makePriorityQueueWorkload(size, seed=0):
+    """
+    Builds a list of (item, priority) operations that mimics what uniform cost
+    search does on a large frontier: every item is pushed once and then about
+    half of them get a cheaper priority before anything is popped.
+    """
+    rng = random.Random(seed)
+    operations = [(i, rng.randint(size, 2 * size)) for i in range(size)]
+    operations += [(rng.randrange(size), rng.randint(0, size)) for _ in range(size / 2)]
+    return operations
+
+def runPriorityQueueWorkload(queueClass, operations):
+    queue = queueClass()
+    for item, priority in operations:
+        queue.update(item, priority)
+    while not queue.isEmpty():
+        queue.pop()
+
+def priorityQueueBenchmark(options):
+    operations = makePriorityQueueWorkload(options.size)
+    print 'Priority queue workload: %d updates, then pop until empty' % len(operations)
+    for queueClass in [util.PriorityQueue, util.IndexedPriorityQueue]:
+        times = [timeCall(runPriorityQueueWorkload, queueClass, operations) for _ in range(options.repeat)]
+        print '  %-22s best of %d: %.3f seconds' % (queueClass.__name__, options.repeat, min(times))
+
+#############################
+# Bidirectional benchmark   #
+#############################
+
+def loadGameState(layoutName, numGhosts=0):
+    "Returns the initial GameState of a layout, without ghosts by default"
+    import layout, pacman
+    gameState = pacman.GameState()
+    gameState.initialize(layout.getLayout(layoutName), numGhosts)
+    return gameState
+
+def bidirectionalBenchmark(options):
+    import search, searchAgents
+    heuristic = searchAgents.manhattanHeuristic
+    functions = [('bfs', search.bfs),
+                 ('bibfs', search.bibfs),
+                 ('astar', lambda problem: search.astar(problem, heuristic)),
+                 ('biastar', lambda problem: search.biastar(problem, heuristic))]
+    print '%-12s %-8s %6s %9s %9s' % ('layout', 'fn', 'cost', 'expanded', 'seconds')
+    for layoutName in ['mediumMaze', 'bigMaze']:
+        gameState = loadGameState(layoutName)
+        for name, function in functions:
+            problem = searchAgents.PositionSearchProblem(gameState, warn=False, visualize=False)
+            start = timeit.default_timer()
+            actions = function(problem)
+            seconds = timeit.default_timer() - start
+            print '%-12s %-8s %6d %9d %9.4f' % (layoutName, name, problem.getCostOfActions(actions),
+                                               problem._expanded, seconds)
+
+#############################
+# Successor benchmark       #
+#############################
+
+def runLookahead(gameState, size, seed=0):
+    """
+    Plays size random moves for every agent in turn, expanding every legal
+    successor of each visited state the way a one-ply lookahead agent does.
+    Returns the number of successors generated.
+    """
+    rng = random.Random(seed)
+    generated = 0
+    state = gameState
+    for move in range(size):
+        agentIndex = move % state.getNumAgents()
+        if state.isWin() or state.isLose():
+            state = gameState
+            agentIndex = 0
+        successors = [state.generateSuccessor(agentIndex, action) for action in state.getLegalActions(agentIndex)]
+        generated += len(successors)
+        state = rng.choice(successors)
+    return generated
+
+def successorsBenchmark(options):
+    for layoutName in ['mediumClassic', 'originalClassic']:
+        gameState = loadGameState(layoutName, numGhosts=4)
+        times = [timeCall(runLookahead, gameState, options.size) for _ in range(options.repeat)]
+        generated = runLookahead(gameState, options.size)
+        print '%-16s %7d successors, best of %d: %.3f seconds (%.0f successors/second)' % (
+            layoutName, generated, options.repeat, min(times), generated / min(times))
+
+#############################
+# Scaling benchmark         #
+#############################
+
+SCALING_AGENTS = ['bfs', 'astar', 'closestDot']
+SCALING_FIELDS = ['date', 'kind', 'width', 'height', 'seed', 'openCells', 'food', 'agent',
+                  'cost', 'expanded', 'seconds', 'peakMemoryKB']
+
+def runScalingCase(case):
+    """
+    Runs one agent on one generated layout and returns its row of the scaling
+    CSV as a dictionary.  case is (kind, size, seed, foodDensity, agent):
+    bfs and astar (with the Manhattan heuristic) find (1, 1) in a
+    PositionSearchProblem, closestDot eats all the food with a
+    ClosestDotSearchAgent.  The disk cache of maze distance tables is off,
+    so any table work is part of the closestDot time.
+    """
+    import layoutGenerator, mazeDistances, pacman, search, searchAgents
+    kind, size, seed, foodDensity, agent = case
+    gameLayout = layoutGenerator.generateLayout(kind, size, size, seed, foodDensity)
+    gameState = pacman.GameState()
+    gameState.initialize(gameLayout, 0)
+    mazeDistances.CACHE_DIR = ''
+    if agent == 'closestDot':
+        stdout, sys.stdout = sys.stdout, cStringIO.StringIO() # The agent prints its path cost
+        try:
+            closestDot = searchAgents.ClosestDotSearchAgent()
+            start = timeit.default_timer()
+            closestDot.registerInitialState(gameState)
+            seconds = timeit.default_timer() - start
+        finally:
+            sys.stdout = stdout
+        cost, expanded = len(closestDot.actions), None # Paths come from breadth first searches
+    else:
+        problem = searchAgents.PositionSearchProblem(gameState, warn=False, visualize=False)
+        start = timeit.default_timer()
+        if agent == 'bfs':
+            actions = search.bfs(problem)
+        else:
+            actions = search.astar(problem, searchAgents.manhattanHeuristic)
+        seconds = timeit.default_timer() - start
+        cost, expanded = problem.getCostOfActions(actions), problem._expanded
+    peakMemoryKB = None
+    if resource is not None:
+        peakMemoryKB = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    walls = gameLayout.walls
+    return {'kind': kind, 'width': gameLayout.width, 'height': gameLayout.height, 'seed': seed,
+            'openCells': walls.width * walls.height - walls.count(), 'food': gameLayout.totalFood,
+            'agent': agent, 'cost': cost, 'expanded': expanded, 'seconds': '%.4f' % seconds,
+            'peakMemoryKB': peakMemoryKB}
+
+def scalingBenchmark(options):
+    """
+    Runs every agent of SCALING_AGENTS on a generated layout of each size
+    and writes one CSV row per run, appending to options.csv (with a header
+    if the file is new) so results from several days can be compared.  Each
+    run gets a fresh process, so peakMemoryKB is the peak resident memory of
+    that run alone, interpreter included.
+    """
+    import multiprocessing
+    try:
+        sizes = [int(size) for size in options.sizes.split(',')]
+    except ValueError:
+        raise ValueError('--sizes must be a comma separated list of integers, not %s' % options.sizes)
+    cases = [(options.kind, size, options.seed, options.food, agent)
+             for size in sizes for agent in SCALING_AGENTS]
+    date = time.strftime('%Y-%m-%d %H:%M:%S')
+    if options.csv == '-':
+        out = sys.stdout
+    else:
+        newFile = not os.path.exists(options.csv)
+        out = open(options.csv, 'a')
+    writer = csv.DictWriter(out, SCALING_FIELDS, lineterminator='\n')
+    if out is sys.stdout or newFile:
+        writer.writeheader()
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        for row in pool.imap(runScalingCase, cases):
+            row['date'] = date
+            writer.writerow(row)
+            out.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+        if out is not sys.stdout: out.close()
+
+BENCHMARKS = {
+    'priorityQueue': priorityQueueBenchmark,
+    'bidirectional': bidirectionalBenchmark,
+    'successors': successorsBenchmark,
+    'scaling': scalingBenchmark,
+}
+
+def readCommand(argv):
+    usageStr = """
+    USAGE:      python benchmark.py <benchmark> <options>
+    BENCHMARKS: %s
+    """ % ', '.join(sorted(BENCHMARKS))
+    parser = OptionParser(usageStr)
+    parser.add_option('-n', '--size', dest='size', type='int', default=5000,
+                      help='Number of items in synthetic workloads [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=3,
+                      help='Number of timed repetitions [Default: %default]')
+    parser.add_option('--sizes', dest='sizes', default='15,31,61',
+                      help='Comma separated layout sizes for the scaling benchmark [Default: %default]')
+    parser.add_option('--kind', dest='kind', default='maze',
+                      help='Generated layout kind for the scaling benchmark (maze, rooms or dotted) [Default: %default]')
+    parser.add_option('--food', dest='food', type='float', default=None,
+                      help='Food density of generated layouts [Default: depends on the kind]')
+    parser.add_option('--seed', dest='seed', type='int', default=0,
+                      help='Random seed of generated layouts [Default: %default]')
+    parser.add_option('--csv', dest='csv', default='-',
+                      help='CSV file the scaling benchmark appends to, - for standard output [Default: %default]')
+    options, args = parser.parse_args(argv)
+    if len(args) != 1 or args[0] not in BENCHMARKS:
+        parser.error('Choose one benchmark from: ' + ', '.join(sorted(BENCHMARKS)))
+    return args[0], options
+
+if __name__ == '__main__':
+    name, options = readCommand(sys.argv[1:])
+    BENCHMARKS[name](options)
@@ -35,7 +35,13 @@ class Agent:
     following methods which will be called if they exist:
 
     def registerInitialState(self, state): # inspects the starting state
+
+    An agent that never modifies the states it is given may set
+    readOnlyObservations to True; the Game then hands it the live game
+    state instead of a deep copy on every move.
     """
+    readOnlyObservations = False
+
     def __init__(self, index=0):
         self.index = index
 
@@ -159,71 +165,179 @@ class AgentState:
     def getDirection(self):
         return self.configuration.getDirection()
 
-class Grid:
+class GridColumn(list):
+    """
+    One column of a Grid.  Reads are plain list indexing; writes go through
+    the Grid that made the column so that it can keep its count and hash up
+    to date.  token tells whether the grid still owns the column or shares
+    it with a copy, in which case the write goes to a private column.
+    """
+    __slots__ = ('grid', 'x', 'token')
+
+    def __init__(self, grid, x, values):
+        list.__init__(self, values)
+        self.grid = grid
+        self.x = x
+        self.token = grid._token
+
+    def __setitem__(self, y, value):
+        self.grid._set(self, y, value)
+
+class GridColumns(list):
+    """
+    The list of columns of a Grid, its data attribute.  Indexing it goes
+    through the grid, so grid.data[x][y] = value still works on grids that
+    share their columns with copies.
+    """
+    __slots__ = ('grid',)
+
+    def __init__(self, grid, columns):
+        list.__init__(self, columns)
+        self.grid = grid
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list.__getitem__(self, i)
+        return self.grid[i]
+
+class Grid(object):
     """
     A 2-dimensional array of objects backed by a list of lists.  Data is accessed
     via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
     y vertical and the origin (0,0) in the bottom left corner.
 
+    The grid also keeps its cells as the bits of one int (bit x * height + y)
+    and the number of True cells, both updated on every write, so hashing,
+    equality and count() do not scan the cells.  copy() is copy-on-write: the
+    copies share their columns, and a column is only duplicated the first
+    time one of the grids indexes it.  Each grid has a token, and it owns
+    the columns made with its current token; copy() gives the original a
+    new token, so that it stops writing to columns its copy can see.
+
     The __str__ method constructs an output that is oriented like a pacman board.
     """
+    CELLS_PER_INT = 30
+    frozen = False # Set by freeze(); copies are never frozen
+
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
-        self.CELLS_PER_INT = 30
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        self._token = object()
+        self.data = GridColumns(self, [GridColumn(self, x, [initialValue] * height) for x in range(width)])
+        if initialValue:
+            self._bits = (1 << (width * height)) - 1
+            self._count = width * height
+        else:
+            self._bits = 0
+            self._count = 0
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        column = list.__getitem__(self.data, i)
+        if column.token is not self._token:
+            # Shared with a copy: take a private column before handing it out
+            column = GridColumn(self, column.x, column)
+            list.__setitem__(self.data, i, column)
+        return column
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        x = list.__getitem__(self.data, key).x
+        list.__setitem__(self.data, key, GridColumn(self, x, [bool(value) for value in item]))
+        self._recount()
+
+    def freeze(self):
+        "Makes every later write to this grid raise; copies can still be written"
+        self.frozen = True
+        return self
+
+    def _set(self, column, y, value):
+        if self.frozen: raise Exception('This Grid is read-only; write to a copy() of it')
+        if column.token is not self._token:
+            # A column fetched before a copy(), which the copy may share: write to our own
+            column = self[column.x]
+        value = bool(value)
+        if y < 0:
+            y += self.height
+        if list.__getitem__(column, y) != value:
+            bit = 1 << (column.x * self.height + y)
+            if value:
+                self._bits |= bit
+                self._count += 1
+            else:
+                self._bits &= ~bit
+                self._count -= 1
+            list.__setitem__(column, y, value)
+
+    def _recount(self):
+        cells = ''.join(['01'[value] for column in reversed(self.data) for value in reversed(column)])
+        self._bits = int(cells or '0', 2)
+        self._count = cells.count('1')
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [[str(column[y])[0] for column in self.data] for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
-        if other == None: return False
-        return self.data == other.data
+        if not isinstance(other, Grid): return False
+        return self._bits == other._bits and self.width == other.width and self.height == other.height
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self._bits)
+
+    def __getstate__(self):
+        return self.packBits()
+
+    def __setstate__(self, bits):
+        self.__init__(bits[0], bits[1], bitRepresentation=bits[2:])
 
     def copy(self):
-        g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g = object.__new__(Grid)
+        g.width = self.width
+        g.height = self.height
+        g._token = object()
+        g.data = GridColumns(g, self.data)
+        g._bits = self._bits
+        g._count = self._count
+        if not self.frozen: # A frozen grid never writes, so it can keep its columns
+            self._token = object() # Neither grid owns a shared column
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        "Same as copy(): copies share their cells until one of them writes"
+        return self.copy()
 
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        if item:
+            return self._count
+        return self.width * self.height - self._count
 
     def asList(self, key = True):
+        mask = self._bits
+        if not key:
+            mask ^= (1 << (self.width * self.height)) - 1
+        return self._maskToList(mask)
+
+    def difference(self, other):
+        "Returns the positions that are True in this grid but not in other, in asList order"
+        return self._maskToList(self._bits & ~other._bits)
+
+    def _maskToList(self, mask):
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+        while mask:
+            low = mask & -mask
+            i = low.bit_length() - 1
+            list.append(self._cellIndexToPosition(i))
+            mask ^= low
         return list
 
     def packBits(self):
@@ -232,17 +346,11 @@ class Grid:
 
         (width, height, bitPackedInts...)
         """
+        size = self.width * self.height
+        cells = bin(self._bits)[2:].zfill(size)[::-1] # cells[i] is '1' if cell i is True
         bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
+        for i in range(0, size - size % self.CELLS_PER_INT + 1, self.CELLS_PER_INT):
+            bits.append(int(cells[i:i + self.CELLS_PER_INT].ljust(self.CELLS_PER_INT, '0'), 2))
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
@@ -254,25 +362,22 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
-        cell = 0
+        cells = []
         for packed in bits:
-            for bit in self._unpackInt(packed, self.CELLS_PER_INT):
-                if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
-                cell += 1
-
-    def _unpackInt(self, packed, size):
-        bools = []
-        if packed < 0: raise ValueError, "must be a positive integer"
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
-            else:
-                bools.append(False)
-        return bools
+            if packed < 0: raise ValueError, "must be a positive integer"
+            cells.append(bin(packed)[2:].zfill(self.CELLS_PER_INT))
+        cells = ''.join(cells)[:self.width * self.height].ljust(self.width * self.height, '0')
+        self.data = GridColumns(self, [GridColumn(self, x, [cell == '1' for cell in cells[x * self.height:(x + 1) * self.height]])
+                                       for x in range(self.width)])
+        self._bits = int(cells[::-1] or '0', 2)
+        self._count = cells.count('1')
+
+def gridFromColumns(columns):
+    "Returns a Grid whose column x holds the booleans in columns[x]"
+    grid = Grid(len(columns), len(columns[0]))
+    grid.data = GridColumns(grid, [GridColumn(grid, x, column) for x, column in enumerate(columns)])
+    grid._recount()
+    return grid
 
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
@@ -280,6 +385,127 @@ def reconstituteGrid(bitRep):
     width, height = bitRep[:2]
     return Grid(width, height, bitRepresentation= bitRep[2:])
 
+class CellIndex:
+    """
+    Numbers the open cells of a walls Grid so that a FoodBitset can keep one
+    bit per open cell.  Every bitset built over the same walls shares one
+    CellIndex.
+    """
+    def __init__(self, walls):
+        self.width = walls.width
+        self.height = walls.height
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.bits = dict((cell, 1 << i) for i, cell in enumerate(self.cells))
+
+class FoodColumn(object):
+    "A read-only view of column x of a FoodBitset, so food[x][y] is one bit test"
+    __slots__ = ('food', 'x')
+
+    def __init__(self, food, x):
+        self.food = food
+        self.x = x
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.food.height
+        return self.food.isSet(self.x, y)
+
+    def __len__(self):
+        return self.food.height
+
+    def __iter__(self):
+        for y in range(self.food.height):
+            yield self.food.isSet(self.x, y)
+
+class FoodBitset(object):
+    """
+    An immutable set of food positions stored as the bits of one int, bit i
+    standing for cellIndex.cells[i].  Hashing, equality and the emptiness
+    test are single int operations, and eating a dot clears one bit of a new
+    bitset, so search states can share their food without copying a Grid.
+
+    The read methods of Grid (grid[x][y], count, asList) work the same way,
+    so heuristics written against food Grids keep working.
+    """
+    __slots__ = ('cellIndex', 'mask', 'width', 'height')
+
+    def __init__(self, cellIndex, mask=0):
+        self.cellIndex = cellIndex
+        self.mask = mask
+        self.width = cellIndex.width
+        self.height = cellIndex.height
+
+    def fromGrid(grid, cellIndex):
+        "Returns the FoodBitset of the True cells of grid; they must be open cells of cellIndex"
+        bits = cellIndex.bits
+        return FoodBitset(cellIndex, sum([bits[cell] for cell in grid.asList()]))
+    fromGrid = staticmethod(fromGrid)
+
+    def without(self, position):
+        "Returns this set with the food at position eaten, or self if there is none there"
+        bit = self.cellIndex.bits.get(position, 0)
+        if not self.mask & bit:
+            return self
+        return FoodBitset(self.cellIndex, self.mask ^ bit)
+
+    def __contains__(self, position):
+        return bool(self.mask & self.cellIndex.bits.get(position, 0))
+
+    def isSet(self, x, y):
+        "Returns True if there is food at (x, y)"
+        return bool(self.mask & self.cellIndex.bits.get((x, y), 0))
+
+    def __getitem__(self, x):
+        return FoodColumn(self, x)
+
+    def __nonzero__(self):
+        return self.mask != 0
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __eq__(self, other):
+        # Bit i only means the same cell in bitsets over the same CellIndex
+        return isinstance(other, FoodBitset) and self.mask == other.mask and self.cellIndex is other.cellIndex
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.cellIndex), self.mask))
+
+    def __str__(self):
+        return str(self.asGrid())
+
+    def count(self, item=True):
+        if item:
+            return len(self)
+        return self.width * self.height - len(self)
+
+    def asList(self, key=True):
+        "Returns the food positions in the order Grid.asList uses"
+        if not key:
+            return self.asGrid().asList(key)
+        cells = self.cellIndex.cells
+        positions = []
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            positions.append(cells[low.bit_length() - 1])
+            mask ^= low
+        return positions
+
+    def copy(self):
+        return self
+
+    deepCopy = copy
+
+    def asGrid(self):
+        grid = Grid(self.width, self.height)
+        for x, y in self.asList():
+            grid[x][y] = True
+        return grid
+
 ####################################
 # Parts you shouldn't have to read #
 ####################################
@@ -370,16 +596,20 @@ class Actions:
 
 class GameStateData:
     """
-
+    A successor shares its food Grid, capsule list and AgentStates with its
+    predecessor.  Code that changes one of them replaces it first: food and
+    capsules are replaced by new objects (see PacmanRules.consume) and agent
+    states are fetched with getAgentStateForUpdate.
     """
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
+            self._sharedAgents = [True] * len(self.agentStates)
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
@@ -395,6 +625,9 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates( self.agentStates )
+        state._sharedAgents = [False] * len(state.agentStates)
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -402,6 +635,16 @@ class GameStateData:
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def getAgentStateForUpdate( self, agentIndex ):
+        """
+        Returns agentStates[agentIndex] for the caller to modify, copying it
+        first if it is still shared with the predecessor.
+        """
+        if self._sharedAgents[agentIndex]:
+            self.agentStates[agentIndex] = self.agentStates[agentIndex].copy()
+            self._sharedAgents[agentIndex] = False
+        return self.agentStates[agentIndex]
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
@@ -424,13 +667,12 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        try:
+            agentHash = hash(tuple(self.agentStates))
+        except TypeError, e:
+            print e
+            raise
+        return int((agentHash + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
@@ -490,7 +732,7 @@ class GameStateData:
         """
         self.food = layout.food.copy()
         #self.capsules = []
-        self.capsules = layout.capsules[:]
+        self.capsules = list(layout.capsules)
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
@@ -502,6 +744,7 @@ class GameStateData:
                 if numGhosts == numGhostAgents: continue # Max ghosts reached already
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+        self._sharedAgents = [False for a in self.agentStates]
         self._eaten = [False for a in self.agentStates]
 
 try:
@@ -527,6 +770,7 @@ class Game:
         self.moveHistory = []
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
+        self.timer = getAlarmTimer()
         self.agentTimeout = False
         import cStringIO
         self.agentOutput = [cStringIO.StringIO() for agent in agents]
@@ -564,9 +808,20 @@ class Game:
         sys.stderr = OLD_STDERR
 
 
+    def observe( self, agentIndex ):
+        """
+        Returns the state to hand to an agent: the game state itself if the
+        agent declares readOnlyObservations, otherwise a deep copy of it.
+        """
+        if getattr(self.agents[agentIndex], 'readOnlyObservations', False):
+            return self.state
+        return self.state.deepCopy()
+
     def run( self ):
         """
-        Main control loop for game play.
+        Main control loop for game play.  Every agent's computation time is
+        added to totalAgentTimes; with catchExceptions the time limits of
+        the rules are also enforced through the process-wide AlarmTimer.
         """
         self.display.initialize(self.state.data)
         self.numMoves = 0
@@ -587,12 +842,9 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
-                            start_time = time.time()
-                            timed_func(self.state.deepCopy())
-                            time_taken = time.time() - start_time
-                            self.totalAgentTimes[i] += time_taken
+                            self.timer.call(self.rules.getMaxStartupTime(i), agent.registerInitialState, self.observe(i))
+                            self.totalAgentTimes[i] += self.timer.lastElapsed
                         except TimeoutFunctionException:
                             print >>sys.stderr, "Agent %d ran out of time on startup!" % i
                             self.unmute()
@@ -604,7 +856,9 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    start_time = clock()
+                    agent.registerInitialState(self.observe(i))
+                    self.totalAgentTimes[i] += clock() - start_time
                 ## TODO: could this exceed the total time
                 self.unmute()
 
@@ -621,35 +875,33 @@ class Game:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = self.timer.call(self.rules.getMoveTimeout(agentIndex), agent.observationFunction, self.observe(agentIndex))
                         except TimeoutFunctionException:
                             skip_action = True
-                        move_time += time.time() - start_time
+                        move_time += self.timer.lastElapsed
                         self.unmute()
                     except Exception,data:
                         self._agentCrash(agentIndex, quiet=False)
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    start_time = clock()
+                    observation = agent.observationFunction(self.observe(agentIndex))
+                    move_time += clock() - start_time
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observe(agentIndex)
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
-                        start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func( observation )
+                        action = self.timer.call(self.rules.getMoveTimeout(agentIndex) - move_time, agent.getAction, observation)
                     except TimeoutFunctionException:
                         print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
                         self.agentTimeout = True
@@ -657,7 +909,7 @@ class Game:
                         self.unmute()
                         return
 
-                    move_time += time.time() - start_time
+                    move_time += self.timer.lastElapsed
 
                     if move_time > self.rules.getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
@@ -683,7 +935,9 @@ class Game:
                     self.unmute()
                     return
             else:
+                start_time = clock()
                 action = agent.getAction(observation)
+                self.totalAgentTimes[agentIndex] += move_time + clock() - start_time
             self.unmute()
 
             # Execute the action
@@ -148,7 +148,8 @@ to follow your instructor's guidelines to receive credit on your project.
     """
     self.fail('FAIL: Exception raised: %s' % inst)
     self.addMessage('')
-    for line in traceback.format_exc().split('\n'):
+    # Exceptions from test cases run in other processes carry their own traceback
+    for line in getattr(inst, 'workerTraceback', None) or traceback.format_exc().split('\n'):
         self.addMessage(line)
 
   def addErrorHints(self, exceptionMap, errorInstance, questionNum):
@@ -301,6 +302,55 @@ to follow your instructor's guidelines to receive credit on your project.
       #print '%%% ' + line + ' %%%'
       #self.messages[self.currentQuestion].append(line)
 
+  def replay(self, events):
+    "Applies the events of a GradesRecorder to the current question, in order"
+    for name, args in events:
+      if name == 'output':
+        sys.stdout.write(args[0])
+      else:
+        getattr(self, name)(*args)
+
+
+class GradesRecorder:
+  """
+  Stands in for Grades while a test case runs in another process.  The
+  grading calls the test case makes and everything it prints are recorded
+  in order, so that Grades.replay(recorder.finish()) in the grading process
+  has the same effect as running the test case there.
+  """
+  RECORDED = ['fail', 'assignZeroCredit', 'addPoints', 'deductPoints',
+              'assignFullCredit', 'addMessage', 'addMessageToEmail']
+
+  def __init__(self):
+    self.events = []
+    self.output = []
+
+  def __getattr__(self, name):
+    if name not in GradesRecorder.RECORDED:
+      raise AttributeError(name)
+    return lambda *args: self.record(name, args)
+
+  def record(self, name, args):
+    self.flushOutput()
+    self.events.append((name, args))
+
+  def write(self, text):
+    "Collects printed text; install the recorder as sys.stdout to capture it"
+    self.output.append(text)
+
+  def flush(self):
+    pass
+
+  def flushOutput(self):
+    if self.output:
+      self.events.append(('output', (''.join(self.output),)))
+      self.output = []
+
+  def finish(self):
+    "Returns the list of recorded (name, args) events"
+    self.flushOutput()
+    return self.events
+
 
 
 
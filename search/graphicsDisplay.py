@@ -153,7 +153,14 @@ class InfoPane:
 
 
 class PacmanGraphics:
-    def __init__(self, zoom=1.0, frameTime=0.0, capture=False):
+    """
+    Draws games in a Tk window.  Updates only redraw what changed since the
+    last drawn state.  When frameTime is (nearly) zero and fps is positive,
+    updates arriving faster than fps frames per second are coalesced: the
+    skipped states are never drawn, and the next frame brings the screen
+    straight to the latest one.
+    """
+    def __init__(self, zoom=1.0, frameTime=0.0, capture=False, fps=0):
         self.have_window = 0
         self.currentGhostImages = {}
         self.pacmanImage = None
@@ -161,6 +168,10 @@ class PacmanGraphics:
         self.gridSize = DEFAULT_GRID_SIZE * zoom
         self.capture = capture
         self.frameTime = frameTime
+        self.fps = fps
+        self.lastFrameTime = 0
+        self.skippedFrames = 0
+        self.pendingState = None
 
     def checkNullDisplay(self):
         return False
@@ -176,6 +187,9 @@ class PacmanGraphics:
 
         # Information
         self.previousState = state
+        self.drawnFood = state.food
+        self.drawnCapsules = state.capsules
+        self.drawnScore = state.score
 
     def startGraphics(self, state):
         self.layout = state.layout
@@ -234,24 +248,52 @@ class PacmanGraphics:
         refresh()
 
     def update(self, newState):
-        agentIndex = newState._agentMoved
-        agentState = newState.agentStates[agentIndex]
-
-        if self.agentImages[agentIndex][0].isPacman != agentState.isPacman: self.swapImages(agentIndex, agentState)
-        prevState, prevImage = self.agentImages[agentIndex]
-        if agentState.isPacman:
-            self.animatePacman(agentState, prevState, prevImage)
+        animate = self.frameTime > 0.01 or self.frameTime < 0
+        now = time.time()
+        if animate or self.fps <= 0 or now - self.lastFrameTime >= 1.0 / self.fps:
+            self.lastFrameTime = now
+            self.drawState(newState, animate)
         else:
-            self.moveGhost(agentState, agentIndex, prevState, prevImage)
-        self.agentImages[agentIndex] = (agentState, prevImage)
-
-        if newState._foodEaten != None:
-            self.removeFood(newState._foodEaten, self.food)
-        if newState._capsuleEaten != None:
-            self.removeCapsule(newState._capsuleEaten, self.capsules)
-        self.infoPane.updateScore(newState.score)
+            self.pendingState = newState
+            self.skippedFrames += 1
+
+    def drawState(self, newState, animate=False):
+        """
+        Brings the screen from the last drawn state to newState, touching
+        only the agents, food, capsules and score that changed.
+        """
+        self.pendingState = None
+        for agentIndex, agentState in enumerate(newState.agentStates):
+            prevState, prevImage = self.agentImages[agentIndex]
+            if prevState is agentState: continue # Shared with the drawn state, so unchanged
+            if prevState.isPacman != agentState.isPacman:
+                self.swapImages(agentIndex, agentState)
+                continue
+            if prevState == agentState: continue
+            if agentState.isPacman:
+                if animate and agentIndex == newState._agentMoved:
+                    self.animatePacman(agentState, prevState, prevImage)
+                else:
+                    self.movePacman(self.getPosition(agentState), self.getDirection(agentState), prevImage)
+            else:
+                self.moveGhost(agentState, agentIndex, prevState, prevImage)
+            self.agentImages[agentIndex] = (agentState, prevImage)
+
+        if newState.food is not self.drawnFood:
+            for cell in self.drawnFood.difference(newState.food):
+                self.removeFood(cell, self.food)
+            self.drawnFood = newState.food
+        if newState.capsules is not self.drawnCapsules:
+            for capsule in self.drawnCapsules:
+                if capsule not in newState.capsules:
+                    self.removeCapsule(capsule, self.capsules)
+            self.drawnCapsules = newState.capsules
+        if newState.score != self.drawnScore:
+            self.infoPane.updateScore(newState.score)
+            self.drawnScore = newState.score
         if 'ghostDistances' in dir(newState):
             self.infoPane.updateGhostDistances(newState.ghostDistances)
+        refresh()
 
     def make_window(self, width, height):
         grid_width = (width-1) * self.gridSize
@@ -411,6 +453,8 @@ class PacmanGraphics:
         return agentState.configuration.getDirection()
 
     def finish(self):
+        if self.pendingState != None:
+            self.drawState(self.pendingState)
         end_graphics()
 
     def to_screen(self, point):
@@ -569,21 +613,27 @@ class PacmanGraphics:
         baseColor = [1.0, 0.0, 0.0]
         self.clearExpandedCells()
         self.expandedCells = []
-        for k, cell in enumerate(cells):
+        colors = [formatColor(*[(n-k) * c * .5 / n + .25 for c in baseColor]) for k in range(len(cells))]
+        if self.frameTime >= 0:
+            # Drawn in one batch, cleared with one call
+            squares([self.to_screen(cell) for cell in cells], 0.5 * self.gridSize, colors, 'expanded', behind=2)
+            self.expandedCells = ['expanded']
+            refresh()
+            return
+        for cell, cellColor in zip(cells, colors):
             screenPos = self.to_screen( cell)
-            cellColor = formatColor(*[(n-k) * c * .5 / n + .25 for c in baseColor])
             block = square(screenPos,
                      0.5 * self.gridSize,
                      color = cellColor,
                      filled = 1, behind=2)
             self.expandedCells.append(block)
-            if self.frameTime < 0:
-                refresh()
+            refresh()
 
     def clearExpandedCells(self):
         if 'expandedCells' in dir(self) and len(self.expandedCells) > 0:
             for cell in self.expandedCells:
                 remove_from_screen(cell)
+            self.expandedCells = []
 
 
     def updateDistributions(self, distributions):
@@ -14,25 +14,33 @@
 
 from util import manhattanDistance
 from game import Grid
+from game import gridFromColumns
 import os
 import random
+import re
 
 VISIBILITY_MATRIX_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are read-only once built: walls and food are frozen Grids and
+    capsules and agentPositions are tuples, so deepCopy() returns the layout
+    itself and games copy whatever they change.
     """
 
     def __init__(self, layoutText):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
-        self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
+        self.walls.freeze()
+        self.food.freeze()
+        self.capsules = tuple(self.capsules)
+        self.agentPositions = tuple(self.agentPositions)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
         # self.initializeVisibilityMatrix()
@@ -90,7 +98,7 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        return self # Layouts are never modified
 
     def processLayoutText(self, layoutText):
         """
@@ -104,12 +112,16 @@ class Layout:
          G - Ghost
          P - Pacman
         Other characters are ignored.
+
+        Walls and food are read a whole column at a time; only the few
+        capsule and agent characters go through processLayoutChar.
         """
-        maxY = self.height - 1
-        for y in range(self.height):
-            for x in range(self.width):
-                layoutChar = layoutText[maxY - y][x]
-                self.processLayoutChar(x, y, layoutChar)
+        rows = layoutText[::-1] # rows[y] is the row at height y
+        self.walls = gridFromColumns([[row[x] == '%' for row in rows] for x in range(self.width)])
+        self.food = gridFromColumns([[row[x] == '.' for row in rows] for x in range(self.width)])
+        for y, row in enumerate(rows):
+            for match in AGENTS_AND_CAPSULES.finditer(row):
+                self.processLayoutChar(match.start(), y, match.group())
         self.agentPositions.sort()
         self.agentPositions = [ ( i == 0, pos) for i, pos in self.agentPositions]
 
@@ -128,19 +140,42 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+
+AGENTS_AND_CAPSULES = re.compile('[oPG1-4]')
+
+_layouts = {} # Absolute file name -> (modification time, Layout)
+
+def layoutSearchPath(back = 2):
+    """
+    Returns the directories getLayout looks in, in order: the current
+    directory and back + 1 of its ancestors, then the directory of this
+    module.  Each directory is searched along with its layouts/ subdirectory.
+    """
+    directories = []
+    directory = os.path.abspath('.')
+    for level in range(back + 2):
+        directories.append(directory)
+        directory = os.path.dirname(directory)
+    moduleDirectory = os.path.dirname(os.path.abspath(__file__))
+    if moduleDirectory not in directories: directories.append(moduleDirectory)
+    return directories
+
 def getLayout(name, back = 2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+    """
+    Returns the Layout called name (the .lay extension is optional) from the
+    first directory of layoutSearchPath(back) that has it, or None.  Each
+    file is parsed once per process, and again only if it changes; every
+    call for it returns the same read-only Layout.
+    """
+    if not name.endswith('.lay'): name += '.lay'
+    for directory in layoutSearchPath(back):
+        for fullname in [os.path.join(directory, 'layouts', name), os.path.join(directory, name)]:
+            if not os.path.exists(fullname): continue
+            modified = os.path.getmtime(fullname)
+            if fullname not in _layouts or _layouts[fullname][0] != modified:
+                _layouts[fullname] = (modified, tryToLoad(fullname))
+            return _layouts[fullname][1]
+    return None
 
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
@@ -0,0 +1,142 @@
+# layoutGenerator.py
+# ------------------
+# Seeded procedural layouts of any size.
+#
+# Usage: python layoutGenerator.py maze 101 101 [--seed 3] [--food 0.1] [-o layouts/bigGenerated.lay]
+
+
+"""
+Builds layouts far larger than the hand-made ones in layouts/, so search
+code can be measured as the board grows.  Three kinds are available:
+
+  maze:   a perfect maze carved by a randomized depth first search, with an
+          optional fraction of extra openings that create loops
+  rooms:  rectangular rooms joined by one door in each shared wall
+  dotted: an open field with a pillar on every other cell of every other
+          row, like openSearch
+
+Every layout has a border of walls, Pacman in the top right corner and a
+dot at (1, 1), the default goal of PositionSearchProblem.  Each other open
+cell holds food with probability foodDensity.  Mazes need odd dimensions,
+so even sizes are rounded up by one.  The same arguments and seed always
+give the same layout.
+"""
+
+import random
+import sys
+from optparse import OptionParser
+
+import layout
+
+DEFAULT_FOOD_DENSITY = {'maze': 0.0, 'rooms': 0.0, 'dotted': 0.5}
+
+def mazeRows(width, height, rng, loops=0.0):
+    "Returns the rows of a maze, as lists of characters, with a fraction loops of its inner walls removed"
+    rows = [['%'] * width for row in range(height)]
+    rows[1][1] = ' '
+    stack = [(1, 1)]
+    while stack:
+        r, c = stack[-1]
+        options = [(r + dr, c + dc) for dr, dc in [(0, 2), (0, -2), (2, 0), (-2, 0)]
+                   if 0 < r + dr < height - 1 and 0 < c + dc < width - 1 and rows[r + dr][c + dc] == '%']
+        if not options:
+            stack.pop()
+            continue
+        nextR, nextC = rng.choice(options)
+        rows[(r + nextR) / 2][(c + nextC) / 2] = ' '
+        rows[nextR][nextC] = ' '
+        stack.append((nextR, nextC))
+    if loops > 0:
+        for r in range(1, height - 1):
+            for c in range(r % 2 + 1, width - 1, 2): # Walls between two cells
+                if rows[r][c] == '%' and rng.random() < loops:
+                    rows[r][c] = ' '
+    return rows
+
+def roomRows(width, height, rng, roomSize=8):
+    "Returns the rows of a grid of roomSize x roomSize rooms with a door between each pair of neighbors"
+    rows = [[' '] * width for row in range(height)]
+    for r in range(height):
+        for c in range(width):
+            if r % (roomSize + 1) == 0 or c % (roomSize + 1) == 0 or r == height - 1 or c == width - 1:
+                rows[r][c] = '%'
+    for wallR in range(roomSize + 1, height - 1, roomSize + 1):
+        for first in range(1, width - 1, roomSize + 1):
+            last = min(first + roomSize, width - 1)
+            rows[wallR][rng.randrange(first, last)] = ' '
+    for wallC in range(roomSize + 1, width - 1, roomSize + 1):
+        for first in range(1, height - 1, roomSize + 1):
+            last = min(first + roomSize, height - 1)
+            rows[rng.randrange(first, last)][wallC] = ' '
+    return rows
+
+def dottedRows(width, height):
+    "Returns the rows of an open field with a pillar on every even row and column"
+    rows = [['%'] * width for row in range(height)]
+    for r in range(1, height - 1):
+        for c in range(1, width - 1):
+            if r % 2 or c % 2:
+                rows[r][c] = ' '
+    return rows
+
+def generateLayout(kind, width, height, seed=0, foodDensity=None, loops=0.0):
+    """
+    Returns a Layout of the given kind ('maze', 'rooms' or 'dotted') that is
+    width x height cells, with food on a fraction foodDensity of its open
+    cells (DEFAULT_FOOD_DENSITY of the kind if None).  Mazes lose a fraction
+    loops of their inner walls.
+    """
+    if kind not in DEFAULT_FOOD_DENSITY:
+        raise ValueError('unknown layout kind %s; choose one of %s' % (kind, ', '.join(sorted(DEFAULT_FOOD_DENSITY))))
+    if width < 5 or height < 5:
+        raise ValueError('layouts must be at least 5 x 5, not %d x %d' % (width, height))
+    if foodDensity is None:
+        foodDensity = DEFAULT_FOOD_DENSITY[kind]
+    rng = random.Random(seed)
+    if kind == 'maze':
+        width, height = width | 1, height | 1
+        rows = mazeRows(width, height, rng, loops)
+    elif kind == 'rooms':
+        rows = roomRows(width, height, rng)
+    else:
+        rows = dottedRows(width, height)
+    for r in range(1, height - 1):
+        for c in range(1, width - 1):
+            if rows[r][c] == ' ' and rng.random() < foodDensity:
+                rows[r][c] = '.'
+    rows[height - 2][1] = '.' # (1, 1)
+    rows[1][width - 2] = 'P'
+    return layout.Layout([''.join(row) for row in rows])
+
+def readCommand(argv):
+    usageStr = """
+    USAGE:      python layoutGenerator.py KIND WIDTH HEIGHT <options>
+    KINDS:      %s
+    """ % ', '.join(sorted(DEFAULT_FOOD_DENSITY))
+    parser = OptionParser(usageStr)
+    parser.add_option('-s', '--seed', dest='seed', type='int', default=0,
+                      help='Random seed [Default: %default]')
+    parser.add_option('-f', '--food', dest='foodDensity', type='float', default=None,
+                      help='Fraction of open cells that hold food [Default: 0.5 for dotted, else 0]')
+    parser.add_option('-l', '--loops', dest='loops', type='float', default=0.0,
+                      help='Fraction of inner maze walls to remove [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='File to write the layout to [Default: standard output]')
+    options, args = parser.parse_args(argv)
+    if len(args) != 3 or args[0] not in DEFAULT_FOOD_DENSITY:
+        parser.error('Give a layout kind, a width and a height')
+    try:
+        width, height = int(args[1]), int(args[2])
+    except ValueError:
+        parser.error('The width and height must be integers')
+    return args[0], width, height, options
+
+if __name__ == '__main__':
+    kind, width, height, options = readCommand(sys.argv[1:])
+    text = str(generateLayout(kind, width, height, options.seed, options.foodDensity, options.loops)) + '\n'
+    if options.output:
+        f = open(options.output, 'w')
+        try: f.write(text)
+        finally: f.close()
+    else:
+        sys.stdout.write(text)
@@ -0,0 +1,268 @@
+# mazeDistances.py
+# ----------------
+# Maze distances between the open cells of a layout.
+
+
+"""
+Shortest-path distances between the open cells of a layout.  A table holds
+one row of distances per source cell, filled on demand by a breadth first
+search from that cell; afterwards distance(p, q) is a single lookup.  Rows
+are only built for the cells that are asked about, so memory and time grow
+with the queries rather than with n^2.
+
+Use getMazeDistanceTable(layout) to share one table between every heuristic
+and agent that works on the same walls.  Complete tables can also be cached
+on disk, one set of .npy files per walls grid, and memory-mapped when a
+later run loads them, so repeated runs on a big layout start at once.  The
+cache is off by default, so nothing is written unless asked for: turn it on
+with pacman.py --mazeCache DIR, autograder.py --maze-cache DIR or the
+PACMAN_MAZE_CACHE environment variable.  fill() only runs for tables that
+are written to the cache; other tables only ever build the rows they use.
+"""
+
+import hashlib
+import os
+from collections import deque
+
+import numpy as np
+
+from game import Actions
+from game import Directions
+
+UNREACHABLE = -1
+CACHE_FORMAT = 2
+CACHE_DIR = os.environ.get('PACMAN_MAZE_CACHE', '')
+
+class MazeDistanceTable:
+    """
+    Maze distances between the open cells of a walls Grid, as one row of
+    distances per source cell.  row(i) runs a breadth first search from cell
+    i the first time it is asked for and keeps the result as a list, so a
+    table costs nothing beyond the rows its callers use.  fill() builds
+    every row into one NumPy array, for the disk cache.
+
+      cells:     the open cells, as (x, y) tuples
+      index:     a dictionary from each open cell to its row number
+      neighbors: a (4, n) array, column j holds the rows of the cells one
+                 NORTH, SOUTH, EAST and WEST move away from cell j, or j
+                 itself where that move hits a wall
+      deadEnds:  a boolean array, True for cells with a single open neighbor
+      distances: None until fill() runs or a cached table is loaded, then
+                 an int32 array where distances[index[p], index[q]] is the
+                 length of a shortest path from p to q (UNREACHABLE if
+                 there is none)
+
+    The arrays can be passed in, e.g. memory-mapped from the disk cache;
+    neighbors and deadEnds are computed when they are not, distances only
+    by fill().
+    """
+    ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+    ARRAYS = ['neighbors', 'deadEnds', 'distances']
+
+    def __init__(self, walls, neighbors=None, deadEnds=None, distances=None):
+        self.walls = walls
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.neighbors = neighbors if neighbors is not None else self._neighborArray()
+        self.deadEnds = deadEnds if deadEnds is not None else self._deadEndArray()
+        self.distances = distances
+        self.moves = zip(*self.neighbors.tolist()) # Per cell, its neighbor for each of ACTIONS
+        self.adjacency = [[i for i in column if i != j] for j, column in enumerate(self.moves)]
+        self._rows = {}
+
+    def _neighborArray(self):
+        """
+        Returns a (4, n) array whose column j holds the rows of the cells next
+        to cell j, one per action; a wall is replaced by j itself.
+        """
+        neighbors = np.empty((len(MazeDistanceTable.ACTIONS), len(self.cells)), dtype=np.intp)
+        for j, (x, y) in enumerate(self.cells):
+            for k, action in enumerate(MazeDistanceTable.ACTIONS):
+                dx, dy = Actions.directionToVector(action)
+                neighbors[k, j] = self.index.get((int(x + dx), int(y + dy)), j)
+        return neighbors
+
+    def _deadEndArray(self):
+        "Returns a boolean array marking the cells with exactly one open neighbor"
+        openNeighbors = (self.neighbors != np.arange(len(self.cells))).sum(axis=0)
+        return openNeighbors == 1
+
+    def _breadthFirstRow(self, source):
+        """
+        Returns the list of distances from cell source to every cell, by a
+        breadth first search over the adjacency lists.  A plain queue beats
+        searching from many sources at once with whole-array NumPy operations:
+        those rescan every cell on each BFS layer, which cost 15 times more on
+        a 61x61 maze and was never more than 20% faster on open layouts.
+        """
+        adjacency = self.adjacency
+        row = [UNREACHABLE] * len(self.cells)
+        row[source] = 0
+        queue = deque([source])
+        while queue:
+            j = queue.popleft()
+            d = row[j] + 1
+            for i in adjacency[j]:
+                if row[i] == UNREACHABLE:
+                    row[i] = d
+                    queue.append(i)
+        return row
+
+    def row(self, i):
+        "Returns the distances from the cell of row i to every cell, indexed by row"
+        if self.distances is not None:
+            return self.distances[i]
+        row = self._rows.get(i)
+        if row is None:
+            row = self._rows[i] = self._breadthFirstRow(i)
+        return row
+
+    def fill(self):
+        "Builds every row, e.g. to save the complete table, and returns distances"
+        if self.distances is None:
+            self.distances = np.array([self.row(i) for i in range(len(self.cells))], dtype=np.int32)
+            self._rows = {}
+        return self.distances
+
+    def distance(self, p, q):
+        "Returns the maze distance between open cells p and q (inf if unreachable)"
+        i, j = self.index[p], self.index[q]
+        if self.distances is not None:
+            d = self.distances.item(i, j)
+        else:
+            row = self._rows.get(j) # Distances are symmetric, so a row built from q serves as well
+            d = row[i] if row is not None else self.row(i)[j]
+        if d == UNREACHABLE:
+            return float('inf')
+        return d
+
+    def pathToClosest(self, start, goals):
+        """
+        Returns a shortest list of actions leading from start to the closest
+        cell marked in goals (anything indexed goals[x][y], like a food
+        Grid), or None if no goal can be reached.  This is one breadth first
+        search that stops at the first goal; it builds no rows.
+        """
+        source = self.index[start]
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            j = queue.popleft()
+            x, y = self.cells[j]
+            if goals[x][y]:
+                path = []
+                while parents[j] is not None:
+                    j, action = parents[j]
+                    path.append(action)
+                path.reverse()
+                return path
+            for action, i in zip(MazeDistanceTable.ACTIONS, self.moves[j]):
+                if i not in parents:
+                    parents[i] = (j, action)
+                    queue.append(i)
+        return None
+
+    def legalNeighbors(self, cell):
+        "Returns the open cells one move away from cell"
+        j = self.index[cell]
+        return [self.cells[i] for i in self.neighbors[:, j] if i != j]
+
+    def isDeadEnd(self, cell):
+        "Returns True if cell has exactly one open neighbor"
+        return bool(self.deadEnds[self.index[cell]])
+
+    def path(self, start, goal):
+        "Returns a shortest list of actions leading from start to goal"
+        toGoal = self.row(self.index[goal])
+        remaining = toGoal[self.index[start]]
+        if remaining == UNREACHABLE:
+            raise ValueError('%s is not reachable from %s' % (goal, start))
+        path = []
+        x, y = start
+        while remaining > 0:
+            for action in MazeDistanceTable.ACTIONS:
+                dx, dy = Actions.directionToVector(action)
+                nextCell = (int(x + dx), int(y + dy))
+                if nextCell in self.index and toGoal[self.index[nextCell]] == remaining - 1:
+                    break
+            path.append(action)
+            x, y = nextCell
+            remaining -= 1
+        return path
+
+_tables = {}
+_frozenWallsTables = {} # id(walls) -> (walls, table) for frozen walls, which cannot change
+
+def wallsKey(walls):
+    "Returns the hash of a walls Grid that names its tables; food and agents do not change distances"
+    return hashlib.sha1('%d\n%s' % (CACHE_FORMAT, walls)).hexdigest()
+
+def getMazeDistanceTable(layout):
+    """
+    Returns the MazeDistanceTable for the walls of layout.  The table is made
+    once per walls grid: later calls in this process share it and the rows
+    it has built, even for layouts that only differ in food or agents, and
+    with the disk cache on later processes memory-map its complete version.
+    Walls that changed get a new key, so stale tables are never loaded.
+    """
+    walls = layout.walls
+    entry = _frozenWallsTables.get(id(walls))
+    if entry is not None and entry[0] is walls: # Skips hashing the walls on every call
+        return entry[1]
+    key = wallsKey(walls)
+    table = _tables.get(key)
+    if table is None:
+        table = loadTable(key, layout.walls)
+        if table is None:
+            table = MazeDistanceTable(layout.walls)
+            if CACHE_DIR:
+                table.fill()
+                saveTable(key, table)
+        _tables[key] = table
+    if walls.frozen:
+        _frozenWallsTables[id(walls)] = (walls, table) # Holding walls keeps its id from being reused
+    return table
+
+def cachePath(key, name):
+    return os.path.join(CACHE_DIR, '%s-%s.npy' % (key, name))
+
+def loadTable(key, walls):
+    """
+    Returns the table cached on disk under key, with its arrays
+    memory-mapped read-only, or None if it is missing or unusable.
+    """
+    if not CACHE_DIR:
+        return None
+    try:
+        arrays = dict((name, np.load(cachePath(key, name), mmap_mode='r'))
+                      for name in MazeDistanceTable.ARRAYS)
+    except (IOError, OSError, ValueError):
+        return None
+    table = MazeDistanceTable(walls, **arrays)
+    n = len(table.cells)
+    if table.distances.shape != (n, n) or table.neighbors.shape != (len(MazeDistanceTable.ACTIONS), n):
+        return None
+    return table
+
+def saveTable(key, table):
+    """
+    Writes the arrays of table to the disk cache under key.  Each file is
+    written under a temporary name and renamed, so concurrent runs never
+    read a partial file.  A cache that cannot be written is skipped.
+    """
+    if not CACHE_DIR:
+        return
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        for name in MazeDistanceTable.ARRAYS:
+            path = cachePath(key, name)
+            temporary = '%s.%d.tmp' % (path, os.getpid())
+            f = open(temporary, 'wb')
+            try:
+                np.save(f, getattr(table, name))
+            finally:
+                f.close()
+            os.rename(temporary, path)
+    except (IOError, OSError):
+        pass
@@ -43,6 +43,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -112,7 +113,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.getAgentStateForUpdate(agentIndex) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -342,7 +343,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getAgentStateForUpdate(0)
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -358,7 +359,7 @@ class PacmanRules:
 
     def consume( position, state ):
         x,y = position
-        # Eat food
+        # Eat food; the food Grid may be shared with earlier states, so copy it first
         if state.data.food[x][y]:
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
@@ -371,11 +372,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            state.data.capsules = [capsule for capsule in state.data.capsules if capsule != position]
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getAgentStateForUpdate(index).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -404,7 +405,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getAgentStateForUpdate(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -414,7 +415,9 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            # A new Configuration, as the old one may be shared with earlier states
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( configuration.pos ), configuration.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -435,10 +438,12 @@ class GhostRules:
 
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            ghostState = state.data.getAgentStateForUpdate(agentIndex)
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
+            state.data._eaten = state.data._eaten[:] # May be shared with earlier states
             state.data._eaten[agentIndex] = True
         else:
             if not state.data._win:
@@ -485,6 +490,9 @@ def readCommand( argv ):
                 (2) python pacman.py --layout smallClassic --zoom 2
                 OR  python pacman.py -l smallClassic -z 2
                     - starts an interactive game on a smaller board, zoomed in
+                (3) python pacman.py -p GreedyAgent --batch 1000 --workers 8
+                    - plays 1000 headless games on 8 processes, writing one
+                      JSON line per game to batch-results.jsonl
     """
     parser = OptionParser(usageStr)
 
@@ -512,17 +520,31 @@ def readCommand( argv ):
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file (binary replay or pickle) to replay', default=None)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('Move number to start a binary replay from'), default=0)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
                       help=default('How many episodes are training (suppresses output)'), default=0)
     parser.add_option('--frameTime', dest='frameTime', type='float',
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
+    parser.add_option('--fps', dest='fps', type='float',
+                      help=default('With --frameTime 0, most frames per second to draw, skipping the rest; 0 draws every move'), default=0)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--batch', dest='batch', type='int',
+                      help='Play GAMES headless games in worker processes instead of --numGames', metavar='GAMES', default=0)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help='Number of worker processes for --batch [Default: one per CPU]', default=0)
+    parser.add_option('--batchResults', dest='batchResults',
+                      help=default('JSON lines file receiving one result per --batch game; - for stdout'),
+                      metavar='FILE', default='batch-results.jsonl')
+    parser.add_option('--mazeCache', dest='mazeCache', metavar='DIR',
+                      help='Cache maze distance tables in DIR, so later runs on the same walls load them '
+                           '[Default: $PACMAN_MAZE_CACHE, else off]', default=None)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -532,6 +554,10 @@ def readCommand( argv ):
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
 
+    if options.mazeCache:
+        import mazeDistances
+        mazeDistances.CACHE_DIR = options.mazeCache
+
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
@@ -543,6 +569,17 @@ def readCommand( argv ):
     if options.numTraining > 0:
         args['numTraining'] = options.numTraining
         if 'numTraining' not in agentOpts: agentOpts['numTraining'] = options.numTraining
+
+    # Special case: batch games build their own agents and display in each worker process
+    if options.batch > 0:
+        spec = {'layout': options.layout, 'pacman': options.pacman, 'agentOpts': agentOpts,
+                'ghost': options.ghost, 'numGhosts': options.numGhosts,
+                'catchExceptions': options.catchExceptions, 'timeout': options.timeout}
+        if options.fixRandomSeed: seed = 'cs188'
+        else: seed = str(random.getrandbits(32))
+        runBatch(spec, options.batch, options.workers, options.batchResults, seed)
+        sys.exit(0)
+
     pacman = pacmanType(**agentOpts) # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
 
@@ -565,7 +602,7 @@ def readCommand( argv ):
         args['display'] = textDisplay.PacmanGraphics()
     else:
         import graphicsDisplay
-        args['display'] = graphicsDisplay.PacmanGraphics(options.zoom, frameTime = options.frameTime)
+        args['display'] = graphicsDisplay.PacmanGraphics(options.zoom, frameTime = options.frameTime, fps = options.fps)
     args['numGames'] = options.numGames
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
@@ -574,6 +611,10 @@ def readCommand( argv ):
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print 'Replaying recorded game %s.' % options.gameToReplay
+        import replays
+        if replays.isReplayFile(options.gameToReplay):
+            replays.replay(options.gameToReplay, args['display'], options.replayFrom)
+            sys.exit(0)
         import cPickle
         f = open(options.gameToReplay)
         try: recorded = cPickle.load(f)
@@ -647,12 +688,9 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         if not beQuiet: games.append(game)
 
         if record:
-            import time, cPickle
+            import time, replays
             fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+            replays.recordGame(fname, layout, rules.initialState, game.moveHistory)
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -665,6 +703,109 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
 
     return games
 
+class BatchSummary:
+    """
+    Running totals over the results of batch games, so that a batch never
+    keeps more than one result in memory.
+    """
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.totalScore = 0.0
+        self.minScore = None
+        self.maxScore = None
+        self.totalMoves = 0
+        self.crashes = 0
+
+    def add(self, result):
+        self.games += 1
+        self.wins += int(result['win'])
+        self.totalScore += result['score']
+        if self.minScore is None or result['score'] < self.minScore: self.minScore = result['score']
+        if self.maxScore is None or result['score'] > self.maxScore: self.maxScore = result['score']
+        self.totalMoves += result['moves']
+        self.crashes += int(result['crashed'])
+
+    def printSummary(self, seconds, out=sys.stdout):
+        if self.games == 0: return
+        print >>out, 'Games:         %d in %.1f seconds (%.1f games/second)' % (self.games, seconds, self.games / max(seconds, 1e-9))
+        print >>out, 'Average Score:', self.totalScore / self.games
+        print >>out, 'Score Range:   %s to %s' % (self.minScore, self.maxScore)
+        print >>out, 'Win Rate:      %d/%d (%.2f)' % (self.wins, self.games, self.wins / float(self.games))
+        print >>out, 'Average Moves: %.1f' % (self.totalMoves / float(self.games))
+        if self.crashes: print >>out, 'Crashes:       %d' % self.crashes
+
+_batchLayouts = {}
+
+def playBatchGame(job):
+    """
+    Plays one batch game and returns its result as a dictionary.  job is
+    (spec, gameIndex, seed); the agents are built from the spec in this
+    process, so every game starts from fresh agents whatever worker plays it.
+    """
+    import textDisplay, __main__
+    spec, gameIndex, seed = job
+    random.seed(seed)
+    if spec['layout'] not in _batchLayouts:
+        _batchLayouts[spec['layout']] = layout.getLayout(spec['layout'])
+    gameLayout = _batchLayouts[spec['layout']]
+    display = textDisplay.NullGraphics()
+    __main__.__dict__['_display'] = display
+
+    import cStringIO
+    stdout, sys.stdout = sys.stdout, cStringIO.StringIO() # Agents are muted in batch games
+    try:
+        pacman = loadAgent(spec['pacman'], True)(**spec['agentOpts'])
+        ghostType = loadAgent(spec['ghost'], True)
+        ghosts = [ghostType(i+1) for i in range(spec['numGhosts'])]
+    finally:
+        sys.stdout = stdout
+    rules = ClassicGameRules(spec['timeout'])
+    game = rules.newGame(gameLayout, pacman, ghosts, display, True, spec['catchExceptions'])
+    game.muteAgents = True
+    start = time.time()
+    game.run()
+    return {'game': gameIndex, 'seed': seed, 'score': game.state.getScore(), 'win': game.state.isWin(),
+            'moves': len(game.moveHistory), 'time': time.time() - start,
+            'agentTimes': game.totalAgentTimes, 'crashed': game.agentCrashed, 'timedOut': game.agentTimeout}
+
+def runBatch(spec, numGames, workers, resultsFile, seed):
+    """
+    Plays numGames headless games on a pool of worker processes (one per
+    CPU if workers is 0), writing each result to resultsFile as a JSON line
+    as soon as it arrives.  Game i is seeded with seed-i, so a batch plays
+    the same games whatever the number of workers; results are written in
+    completion order and carry their game index.
+    """
+    import json, multiprocessing
+    if workers <= 0: workers = multiprocessing.cpu_count()
+    jobs = [(spec, i, '%s-%d' % (seed, i)) for i in range(numGames)]
+    if resultsFile == '-': out = sys.stdout
+    else: out = open(resultsFile, 'w')
+    summary = BatchSummary()
+    start = time.time()
+    pool = None
+    try:
+        if workers == 1:
+            results = (playBatchGame(job) for job in jobs)
+        else:
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap_unordered(playBatchGame, jobs)
+        for result in results:
+            out.write(json.dumps(result, sort_keys=True) + '\n')
+            out.flush()
+            summary.add(result)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if out is not sys.stdout: out.close()
+    if resultsFile == '-': report = sys.stderr # Keep stdout pure JSON lines
+    else: report = sys.stdout
+    print >>report, 'Batch of %d games on %d worker(s), results in %s' % (numGames, workers, resultsFile)
+    summary.printSummary(time.time() - start, report)
+    return summary
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -0,0 +1,308 @@
+# replays.py
+# ----------
+# Compact binary recordings of Pacman games.
+#
+# Usage: python replays.py convert recorded-game-1-... [-o DIRECTORY]
+#        python replays.py info game.replay
+
+
+"""
+A replay file holds the layout of a game and its moves packed one byte per
+move, with a snapshot of the game state (a keyframe) every few moves, so a
+reader can jump to any move without re-simulating the game from its start.
+
+The file is a header, a sequence of blocks and an index:
+
+  header:   MAGIC, keyframe interval, SHA-1 of the layout text, layout text
+  'K' block: move number and a snapshot of the state after that many moves
+  'M' block: a run of moves, each (agentIndex << 3) | action code
+  index:    number of moves, then (move number, offset) of every keyframe,
+            followed by the offset of the index and INDEX_MAGIC
+
+Blocks are written as the game goes, so a reader can stream the moves of a
+file whose index was never written; it then scans the blocks to seek.
+"""
+
+import cPickle
+import hashlib
+import os
+import struct
+import sys
+from optparse import OptionParser
+
+import layout
+from game import Configuration
+from game import Directions
+from game import reconstituteGrid
+
+MAGIC = 'PACREPL1'
+INDEX_MAGIC = 'PACRIDX1'
+KEYFRAME_INTERVAL = 100
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+MAX_AGENTS = 32
+
+def layoutHash(gameLayout):
+    "Returns the SHA-1 digest of the text of gameLayout"
+    return hashlib.sha1('\n'.join(gameLayout.layoutText)).digest()
+
+def isReplayFile(filename):
+    "Returns True if filename starts like a binary replay"
+    f = open(filename, 'rb')
+    try: return f.read(len(MAGIC)) == MAGIC
+    finally: f.close()
+
+def snapshot(state):
+    "Returns the parts of a GameState that moves change, as plain Python values"
+    data = state.data
+    agents = [(agent.configuration.pos, agent.configuration.direction, agent.scaredTimer)
+              for agent in data.agentStates]
+    return (data.score, data.food.packBits(), list(data.capsules), data._win, data._lose, agents)
+
+def restore(gameLayout, frame):
+    "Returns the GameState on gameLayout described by snapshot frame"
+    from pacman import GameState
+    score, food, capsules, win, lose, agents = frame
+    state = GameState()
+    state.initialize(gameLayout, len(agents) - 1)
+    data = state.data
+    data.score = score
+    data.food = reconstituteGrid(food)
+    data.capsules = capsules
+    data._win = win
+    data._lose = lose
+    for agentState, (pos, direction, scaredTimer) in zip(data.agentStates, agents):
+        agentState.configuration = Configuration(pos, direction)
+        agentState.scaredTimer = scaredTimer
+    return state
+
+class ReplayWriter:
+    """
+    Writes a replay to the binary file object f as moves are added.  Call
+    close() to write the index; the file object is left open.
+    """
+    def __init__(self, f, gameLayout, initialState, keyframeInterval=KEYFRAME_INTERVAL):
+        self.f = f
+        self.keyframeInterval = keyframeInterval
+        self.numMoves = 0
+        self.pendingMoves = []
+        self.keyframes = []
+        text = '\n'.join(gameLayout.layoutText)
+        f.write(MAGIC)
+        f.write(struct.pack('<I20sI', keyframeInterval, layoutHash(gameLayout), len(text)))
+        f.write(text)
+        self._writeKeyframe(initialState)
+
+    def addMove(self, agentIndex, action, state):
+        "Adds a move; state is the GameState it leads to"
+        if not 0 <= agentIndex < MAX_AGENTS:
+            raise ValueError('replays hold at most %d agents, not agent %d' % (MAX_AGENTS, agentIndex))
+        self.pendingMoves.append(chr(agentIndex << 3 | ACTION_CODES[action]))
+        self.numMoves += 1
+        if self.numMoves % self.keyframeInterval == 0:
+            self._flushMoves()
+            self._writeKeyframe(state)
+
+    def close(self):
+        self._flushMoves()
+        indexOffset = self.f.tell()
+        self.f.write('I' + struct.pack('<II', self.numMoves, len(self.keyframes)))
+        for moveNumber, offset in self.keyframes:
+            self.f.write(struct.pack('<IQ', moveNumber, offset))
+        self.f.write(struct.pack('<Q', indexOffset) + INDEX_MAGIC)
+
+    def _flushMoves(self):
+        if not self.pendingMoves: return
+        self.f.write('M' + struct.pack('<I', len(self.pendingMoves)) + ''.join(self.pendingMoves))
+        self.pendingMoves = []
+
+    def _writeKeyframe(self, state):
+        self.keyframes.append((self.numMoves, self.f.tell()))
+        frame = cPickle.dumps(snapshot(state), 2)
+        self.f.write('K' + struct.pack('<II', self.numMoves, len(frame)) + frame)
+
+class ReplayReader:
+    """
+    Reads a replay from the binary file object f.
+
+      layout:    the Layout the game was played on
+      numMoves:  the number of moves in the game
+      keyframes: a list of (move number, file offset) for every keyframe
+    """
+    def __init__(self, f):
+        self.f = f
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not a replay file')
+        self.keyframeInterval, digest, length = struct.unpack('<I20sI', f.read(28))
+        text = f.read(length)
+        self.layout = layout.Layout(text.split('\n'))
+        if layoutHash(self.layout) != digest:
+            raise ValueError('the layout of this replay is corrupt')
+        self.bodyOffset = f.tell()
+        if not self._readIndex():
+            self._scanBlocks()
+
+    def _readIndex(self):
+        "Loads the index at the end of the file; returns False if there is none"
+        trailerSize = 8 + len(INDEX_MAGIC)
+        self.f.seek(0, os.SEEK_END)
+        if self.f.tell() - self.bodyOffset < trailerSize: return False
+        self.f.seek(-trailerSize, os.SEEK_END)
+        trailer = self.f.read(trailerSize)
+        if trailer[8:] != INDEX_MAGIC: return False
+        self.f.seek(struct.unpack('<Q', trailer[:8])[0])
+        if self.f.read(1) != 'I': return False
+        self.numMoves, count = struct.unpack('<II', self.f.read(8))
+        self.keyframes = [struct.unpack('<IQ', self.f.read(12)) for i in range(count)]
+        return True
+
+    def _scanBlocks(self):
+        "Builds the index by walking every block, for files that were never closed"
+        self.numMoves = 0
+        self.keyframes = []
+        for offset, kind, moveNumber, payload in self._blocks(self.bodyOffset):
+            if kind == 'K': self.keyframes.append((moveNumber, offset))
+            else: self.numMoves += len(payload)
+
+    def _blocks(self, offset):
+        "Yields (offset, kind, move number, payload) for each block from offset on"
+        self.f.seek(offset)
+        moveNumber = 0
+        while True:
+            offset = self.f.tell()
+            kind = self.f.read(1)
+            if kind == 'K':
+                header = self.f.read(8)
+                if len(header) < 8: return
+                moveNumber, length = struct.unpack('<II', header)
+            elif kind == 'M':
+                header = self.f.read(4)
+                if len(header) < 4: return
+                length, = struct.unpack('<I', header)
+            else:
+                return # The index, or the end of an unclosed file
+            payload = self.f.read(length)
+            if len(payload) < length: return # A block cut short by a crash
+            position = self.f.tell()
+            yield offset, kind, moveNumber, payload
+            self.f.seek(position)
+            if kind == 'M': moveNumber += len(payload)
+
+    def moves(self, start=0):
+        "Yields (agentIndex, action) for every move from move number start on"
+        offset, keyframeMove = self._keyframeBefore(start)
+        for blockOffset, kind, moveNumber, payload in self._blocks(offset):
+            if kind != 'M': continue
+            for i, byte in enumerate(payload):
+                if moveNumber + i < start: continue
+                code = ord(byte)
+                yield code >> 3, ACTIONS[code & 7]
+
+    def seek(self, moveNumber):
+        "Returns the GameState after moveNumber moves"
+        if not 0 <= moveNumber <= self.numMoves:
+            raise IndexError('move %d is not in a game of %d moves' % (moveNumber, self.numMoves))
+        offset, keyframeMove = self._keyframeBefore(moveNumber)
+        self.f.seek(offset)
+        self.f.read(1)
+        keyframeMove, length = struct.unpack('<II', self.f.read(8))
+        state = restore(self.layout, cPickle.loads(self.f.read(length)))
+        if moveNumber > keyframeMove:
+            for i, (agentIndex, action) in enumerate(self.moves(keyframeMove)):
+                state = state.generateSuccessor(agentIndex, action)
+                if keyframeMove + i + 1 == moveNumber: break
+        return state
+
+    def states(self, start=0):
+        "Yields the GameState after each move, starting with the state after start moves"
+        state = self.seek(start)
+        yield state
+        for agentIndex, action in self.moves(start):
+            state = state.generateSuccessor(agentIndex, action)
+            yield state
+
+    def _keyframeBefore(self, moveNumber):
+        "Returns (offset, move number) of the last keyframe at or before moveNumber"
+        best = self.keyframes[0]
+        for keyframe in self.keyframes:
+            if keyframe[0] <= moveNumber: best = keyframe
+            else: break
+        return best[1], best[0]
+
+def recordGame(filename, gameLayout, initialState, actions, keyframeInterval=KEYFRAME_INTERVAL):
+    """
+    Writes the game that started from initialState and played actions, a
+    list of (agentIndex, action), to filename as a binary replay.
+    """
+    f = open(filename, 'wb')
+    try:
+        writer = ReplayWriter(f, gameLayout, initialState, keyframeInterval)
+        state = initialState
+        for agentIndex, action in actions:
+            state = state.generateSuccessor(agentIndex, action)
+            writer.addMove(agentIndex, action, state)
+        writer.close()
+    finally:
+        f.close()
+
+def convertRecording(pickleFile, replayFile, keyframeInterval=KEYFRAME_INTERVAL):
+    "Converts a recording pickled by pacman.py -r into a binary replay"
+    from pacman import GameState
+    f = open(pickleFile, 'rb')
+    try: recorded = cPickle.load(f)
+    finally: f.close()
+    gameLayout = recorded['layout']
+    initialState = GameState()
+    initialState.initialize(gameLayout, gameLayout.getNumGhosts())
+    recordGame(replayFile, gameLayout, initialState, recorded['actions'], keyframeInterval)
+
+def replay(filename, display, start=0):
+    "Shows the replay in filename on display, starting after start moves"
+    f = open(filename, 'rb')
+    try:
+        reader = ReplayReader(f)
+        states = reader.states(start)
+        state = states.next()
+        display.initialize(state.data)
+        for state in states:
+            display.update(state.data)
+        if state.isWin(): print "Pacman emerges victorious! Score: %d" % state.data.score
+        if state.isLose(): print "Pacman died! Score: %d" % state.data.score
+        display.finish()
+    finally:
+        f.close()
+
+def readCommand(argv):
+    usageStr = """
+    USAGE:      python replays.py convert RECORDING... [-o DIRECTORY]
+                python replays.py info REPLAY...
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-o', '--outputDirectory', dest='outputDirectory', default=None,
+                      help='Directory for converted replays [Default: next to each recording]')
+    parser.add_option('-k', '--keyframeInterval', dest='keyframeInterval', type='int', default=KEYFRAME_INTERVAL,
+                      help='Moves between keyframes [Default: %default]')
+    options, args = parser.parse_args(argv)
+    if len(args) < 2 or args[0] not in ['convert', 'info']:
+        parser.error('Choose convert or info, then one or more files')
+    return args[0], args[1:], options
+
+if __name__ == '__main__':
+    command, filenames, options = readCommand(sys.argv[1:])
+    for filename in filenames:
+        if command == 'convert':
+            replayFile = filename + '.replay'
+            if options.outputDirectory:
+                replayFile = os.path.join(options.outputDirectory, os.path.basename(replayFile))
+            convertRecording(filename, replayFile, options.keyframeInterval)
+            print '%s -> %s (%d bytes, was %d)' % (filename, replayFile, os.path.getsize(replayFile), os.path.getsize(filename))
+        else:
+            f = open(filename, 'rb')
+            try:
+                reader = ReplayReader(f)
+                final = reader.seek(reader.numMoves)
+                print '%s: %dx%d layout, %d moves, %d keyframes, final score %d' % (
+                    filename, reader.layout.width, reader.layout.height, reader.numMoves,
+                    len(reader.keyframes), final.getScore())
+            finally:
+                f.close()
@@ -17,8 +17,16 @@ In search.py, you will implement generic search algorithms which are called by
 Pacman agents (in searchAgents.py).
 """
 
+import json
+import time
+import timeit
 import util
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 class SearchProblem:
     """
     This class outlines the structure of a search problem, but doesn't implement
@@ -61,6 +69,327 @@ class SearchProblem:
         """
         util.raiseNotDefined()
 
+    def getGoalState(self):
+        """
+        Returns the single goal state of the problem.  Only needed by the
+        bidirectional searches; problems with many goals need not define it.
+        """
+        util.raiseNotDefined()
+
+    def getPredecessors(self, state):
+        """
+          state: Search state
+
+        The reverse of getSuccessors: returns a list of triples, (predecessor,
+        action, stepCost), where 'action' leads from 'predecessor' to state at
+        a cost of 'stepCost'.  Only needed by the bidirectional searches.
+        """
+        util.raiseNotDefined()
+
+
+class ReversedSearchProblem(SearchProblem):
+    """
+    Views a problem with a single goal backwards: it starts at the goal, its
+    goal is the original start state and its successors are the original
+    predecessors.  Any other attribute (walls, costFn, ...) is read from the
+    original problem, so a heuristic that measures the distance to
+    problem.goal, like manhattanHeuristic, estimates the distance to the
+    original start state when given the reversed problem.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.goal = problem.getStartState()
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.getGoalState()
+
+    def getGoalState(self):
+        return self.goal
+
+    def isGoalState(self, state):
+        return state == self.goal
+
+    def getSuccessors(self, state):
+        return self.problem.getPredecessors(state)
+
+    def getPredecessors(self, state):
+        return self.problem.getSuccessors(state)
+
+
+class CachedSearchProblem(SearchProblem):
+    """
+    Wraps a search problem and memoizes getSuccessors, getPredecessors and
+    isGoalState per state, each in a util.LRUCache holding at most cacheSize
+    states.  Their hit and miss counters are in successorCache,
+    predecessorCache and goalCache.  Any other attribute is read from the
+    wrapped problem.
+
+    A cache hit still counts as an expansion: the wrapped problem's _expanded
+    counter and its _visited and _visitedlist record of expanded cells, if
+    it has them, are updated as if it had been called, and a goal test that
+    hits a goal is passed through so that the problem can draw it.  The
+    expansion counts checked by the autograder and the display are the same
+    as without the cache.  Successor lists are copied out of the cache, so
+    callers may modify them.
+    """
+
+    def __init__(self, problem, cacheSize=100000):
+        self.problem = problem
+        self.successorCache = util.LRUCache(int(cacheSize))
+        self.predecessorCache = util.LRUCache(int(cacheSize))
+        self.goalCache = util.LRUCache(int(cacheSize))
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def getGoalState(self):
+        return self.problem.getGoalState()
+
+    def isGoalState(self, state):
+        isGoal = self.goalCache.get(state)
+        if isGoal is None:
+            isGoal = self.problem.isGoalState(state)
+            self.goalCache.put(state, isGoal)
+        elif isGoal:
+            self.problem.isGoalState(state) # Rare, and the problem may record goals for display
+        return isGoal
+
+    def expand(self, cache, expandFunction, state):
+        successors = cache.get(state)
+        if successors is None:
+            successors = expandFunction(state)
+            cache.put(state, successors)
+        else:
+            self.recordExpansion(state)
+        return list(successors)
+
+    def recordExpansion(self, state):
+        "Updates the wrapped problem's expansion bookkeeping the way its own getSuccessors does"
+        problem = self.problem
+        if hasattr(problem, '_expanded'):
+            problem._expanded += 1
+        visited = getattr(problem, '_visited', None)
+        if visited is not None and state not in visited:
+            visited[state] = True
+            problem._visitedlist.append(state)
+
+    def getSuccessors(self, state):
+        return self.expand(self.successorCache, self.problem.getSuccessors, state)
+
+    def getPredecessors(self, state):
+        return self.expand(self.predecessorCache, self.problem.getPredecessors, state)
+
+    def getCostOfActions(self, actions):
+        return self.problem.getCostOfActions(actions)
+
+    def cacheReport(self):
+        "Returns a one-line summary of the cache hits and misses"
+        caches = [('successors', self.successorCache), ('predecessors', self.predecessorCache),
+                  ('goal tests', self.goalCache)]
+        return ', '.join('%s %d hits / %d misses' % (name, cache.hits, cache.misses)
+                         for name, cache in caches if cache.hits + cache.misses > 0)
+
+class SearchStats:
+    """
+    Counters and timers that the search functions below fill in when they are
+    given one as their stats argument:
+
+      expanded       calls to getSuccessors (or getPredecessors)
+      generated      successors returned by those calls
+      duplicates     successors and frontier entries dropped because their
+                     state had already been reached or closed
+      maxFrontier    largest number of entries held in the frontier(s)
+      processPeakMemoryKB
+                     peak resident memory of the whole process so far when
+                     the search stopped (None if unknown); it never goes
+                     down, so a search only shows its own peak if it is the
+                     largest one the process has run
+      successorTime  seconds spent in getSuccessors/getPredecessors
+      heuristicTime  seconds spent computing heuristics and priorities
+      queueTime      seconds spent in frontier operations
+      wallTime       total seconds spent in the search
+
+    The timers wrap every call, so searches run somewhat slower while they
+    are being measured.  A SearchStats built with enabled=False records the
+    cheap counters only and leaves problems and frontiers unwrapped; that is
+    what the searches use when they are not given one.
+    """
+    FIELDS = ['expanded', 'generated', 'duplicates', 'maxFrontier', 'processPeakMemoryKB',
+              'successorTime', 'heuristicTime', 'queueTime', 'wallTime']
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.maxFrontier = 0
+        self.frontierSize = 0
+        self.processPeakMemoryKB = None
+        self.successorTime = 0.0
+        self.heuristicTime = 0.0
+        self.queueTime = 0.0
+        self.wallTime = 0.0
+
+    def start(self):
+        self.startTime = timeit.default_timer()
+
+    def stop(self):
+        self.wallTime += timeit.default_timer() - self.startTime
+        if resource is not None:
+            self.processPeakMemoryKB = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def trackProblem(self, problem):
+        "Returns problem, wrapped so that expansions are counted and timed"
+        if not self.enabled:
+            return problem
+        return TrackedProblem(problem, self)
+
+    def trackFrontier(self, frontier):
+        "Returns frontier, wrapped so that its size and operations are tracked"
+        if not self.enabled:
+            return frontier
+        return TrackedFrontier(frontier, self)
+
+    def timed(self, function, field):
+        "Returns function, wrapped so that its running time is added to field"
+        if not self.enabled:
+            return function
+        def timedFunction(*args):
+            start = timeit.default_timer()
+            try:
+                return function(*args)
+            finally:
+                setattr(self, field, getattr(self, field) + timeit.default_timer() - start)
+        return timedFunction
+
+    def noteFrontier(self, size):
+        "Records a frontier size for searches whose frontier is not tracked"
+        self.maxFrontier = max(self.maxFrontier, size)
+
+    def asDict(self):
+        return dict((field, getattr(self, field)) for field in SearchStats.FIELDS)
+
+    def toJson(self):
+        return json.dumps(self.asDict(), indent=2, sort_keys=True)
+
+    def __str__(self):
+        lines = []
+        for field in SearchStats.FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, float):
+                value = '%.4f' % value
+            lines.append('  %-20s %s' % (field, value))
+        return 'Search statistics:\n' + '\n'.join(lines)
+
+class TrackedProblem(SearchProblem):
+    "A SearchProblem wrapper that reports expansions to a SearchStats."
+
+    def __init__(self, problem, stats):
+        self.problem = problem
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def getGoalState(self):
+        return self.problem.getGoalState()
+
+    def isGoalState(self, state):
+        return self.problem.isGoalState(state)
+
+    def expand(self, expandFunction, state):
+        start = timeit.default_timer()
+        successors = expandFunction(state)
+        self.stats.successorTime += timeit.default_timer() - start
+        self.stats.expanded += 1
+        self.stats.generated += len(successors)
+        return successors
+
+    def getSuccessors(self, state):
+        return self.expand(self.problem.getSuccessors, state)
+
+    def getPredecessors(self, state):
+        return self.expand(self.problem.getPredecessors, state)
+
+    def getCostOfActions(self, actions):
+        return self.problem.getCostOfActions(actions)
+
+class TrackedFrontier:
+    """
+    A frontier wrapper that times the queue operations and keeps the total
+    size of all tracked frontiers of a SearchStats, and its peak, up to date.
+    """
+
+    def __init__(self, frontier, stats):
+        self.frontier = frontier
+        self.stats = stats
+        self.size = 0
+
+    def call(self, method, *args):
+        start = timeit.default_timer()
+        result = method(*args)
+        stats = self.stats
+        stats.queueTime += timeit.default_timer() - start
+        size = len(self.frontier)
+        stats.frontierSize += size - self.size
+        stats.maxFrontier = max(stats.maxFrontier, stats.frontierSize)
+        self.size = size
+        return result
+
+    def push(self, *args):
+        return self.call(self.frontier.push, *args)
+
+    def pushMany(self, items):
+        return self.call(self.frontier.pushMany, items)
+
+    def pop(self):
+        return self.call(self.frontier.pop)
+
+    def update(self, item, priority):
+        return self.call(self.frontier.update, item, priority)
+
+    def topPriority(self):
+        return self.call(self.frontier.topPriority)
+
+    def isEmpty(self):
+        return self.frontier.isEmpty()
+
+    def __iter__(self):
+        return iter(self.frontier)
+
+    def __contains__(self, item):
+        return item in self.frontier
+
+    def __len__(self):
+        return len(self.frontier)
+
+def runSearch(search, problem, stats, *args):
+    """
+    Calls search(problem, *args, stats=stats).  If stats is a SearchStats,
+    the problem is wrapped to count its expansions and the wall time of the
+    whole search is recorded; otherwise a disabled SearchStats is used.
+    """
+    if stats is None:
+        return search(problem, *args, stats=SearchStats(enabled=False))
+    stats.start()
+    try:
+        return search(stats.trackProblem(problem), *args, stats=stats)
+    finally:
+        stats.stop()
+
 
 def tinyMazeSearch(problem):
     """
@@ -72,7 +401,106 @@ def tinyMazeSearch(problem):
     w = Directions.WEST
     return  [s, s, w, s, w, w, s, w]
 
-def depthFirstSearch(problem):
+def graphSearch(problem, frontier, stats):
+    """
+    Generic graph search used by depthFirstSearch and breadthFirstSearch.
+
+    frontier: an empty util.Stack or util.Queue (anything with push, pushMany,
+              pop and isEmpty)
+    stats: the SearchStats to fill in
+
+    Frontier entries are (state, parent, action) tuples.  A state is closed
+    the first time it is popped, at which point its parent pointer is
+    recorded; the list of actions is only rebuilt once, when a goal is popped.
+    """
+    frontier = stats.trackFrontier(frontier)
+    closed = set()
+    parents = {}
+    frontier.push((problem.getStartState(), None, None))
+
+    while not frontier.isEmpty():
+        (state, parent, action) = frontier.pop()
+        if state in closed:
+            stats.duplicates += 1
+            continue
+        parents[state] = (parent, action)
+        if problem.isGoalState(state):
+            return reconstructPath(parents, state)
+
+        closed.add(state)
+        successors = problem.getSuccessors(state)
+        fresh = [(suc, state, sucAction) for suc, sucAction, _ in successors if suc not in closed]
+        stats.duplicates += len(successors) - len(fresh)
+        frontier.pushMany(fresh)
+    return []
+
+def bestFirstSearch(problem, priorityFunction, stats):
+    """
+    Generic graph search used by uniformCostSearch, aStarSearch and their
+    weighted and greedy variants.
+
+    priorityFunction: (state, cost) -> priority, where cost is the cost of the
+    best path found so far from the start state to state.
+    stats: the SearchStats to fill in
+
+    The frontier is a util.IndexedPriorityQueue keyed on states, so a state
+    is queued at most once and a cheaper path to it is a decrease-key.
+    """
+    frontier = stats.trackFrontier(util.IndexedPriorityQueue())
+    priorityFunction = stats.timed(priorityFunction, 'heuristicTime')
+    start = problem.getStartState()
+    closed = set()
+    parents = {start: (None, None)}
+    costs = {start: 0}
+    frontier.push(start, priorityFunction(start, 0))
+
+    while not frontier.isEmpty():
+        state = frontier.pop()
+        if problem.isGoalState(state):
+            return reconstructPath(parents, state)
+
+        closed.add(state)
+        cost = costs[state]
+        for suc, action, stepCost in problem.getSuccessors(state):
+            if suc in closed:
+                stats.duplicates += 1
+                continue
+            sucCost = cost + stepCost
+            if frontier.update(suc, priorityFunction(suc, sucCost)):
+                parents[suc] = (state, action)
+                costs[suc] = sucCost
+            else:
+                stats.duplicates += 1
+    return []
+
+def reconstructPath(parents, state):
+    """
+    Follows the parent pointers from state back to the start state and
+    returns the list of actions that leads from the start to state.
+    """
+    path = []
+    parent, action = parents[state]
+    while parent is not None:
+        path.append(action)
+        parent, action = parents[parent]
+    path.reverse()
+    return path
+
+def reconstructSuffix(children, state):
+    """
+    The backward counterpart of reconstructPath: children maps each state
+    reached by a backward search to (child, action), where action leads from
+    the state to the child.  Returns the actions that lead from state to the
+    goal.
+    """
+    path = []
+    child, action = children[state]
+    while child is not None:
+        path.append(action)
+        child, action = children[child]
+    return path
+
+def depthFirstSearch(problem, stats=None):
     """
     Search the deepest nodes in the search tree first.
 
@@ -87,65 +515,17 @@ def depthFirstSearch(problem):
     print "Start's successors:", problem.getSuccessors(problem.getStartState())
     """
     "*** YOUR CODE HERE ***"
-    stack = util.Stack()
-    state = (problem.getStartState(), [])
-    stack.push(state)
-    visited = []
-
-    while(not stack.isEmpty()):
-        (current_state, path) = stack.pop()
-        if problem.isGoalState(current_state):
-            return path
+    return runSearch(graphSearch, problem, stats, util.Stack())
 
-        if current_state not in visited:
-            visited.append(current_state)
-            for suc, action, _ in problem.getSuccessors(current_state):
-                stack.push((suc, path + [action]))
-    return []
-
-def breadthFirstSearch(problem):
+def breadthFirstSearch(problem, stats=None):
     """Search the shallowest nodes in the search tree first."""
     "*** YOUR CODE HERE ***"
-    """
-    Problem has: getStartState, getSuccessors, isGoalState
-    """
-    queue = util.Queue()
-    state = (problem.getStartState(), [])
-    queue.push(state)
-    visited = []
-
-    while(not queue.isEmpty()):
-        (current_state, path) = queue.pop()
-        if problem.isGoalState(current_state):
-            return path
-
-        if current_state not in visited:
-            visited.append(current_state)
-            for suc, action, _ in problem.getSuccessors(current_state):
-                queue.push((suc, path + [action]))
-    return []
-
+    return runSearch(graphSearch, problem, stats, util.Queue())
 
-def uniformCostSearch(problem):
+def uniformCostSearch(problem, stats=None):
     """Search the node of least total cost first."""
     "*** YOUR CODE HERE ***"
-    queue = util.PriorityQueue()
-    state = (problem.getStartState(), [], 0)
-    queue.update(state, 0)
-    visited = []
-
-    while(not queue.isEmpty()):
-        (current_state, path, cost) = queue.pop()
-        if problem.isGoalState(current_state):
-            return path
-
-        if current_state not in visited:
-            visited.append(current_state)
-            for suc, action, c in problem.getSuccessors(current_state):
-                suc_cost = cost + c
-                new_state = (suc, path + [action], suc_cost)
-                queue.update(new_state, suc_cost)
-    return []
+    return runSearch(bestFirstSearch, problem, stats, lambda state, cost: cost)
 
 def nullHeuristic(state, problem=None):
     """
@@ -154,26 +534,316 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
-def aStarSearch(problem, heuristic=nullHeuristic):
+def aStarSearch(problem, heuristic=nullHeuristic, stats=None):
     """Search the node that has the lowest combined cost and heuristic first."""
     "*** YOUR CODE HERE ***"
-    queue = util.PriorityQueue()
-    state = (problem.getStartState(), [], 0)
-    queue.update(state, 0)
-    visited = []
-
-    while(not queue.isEmpty()):
-        (current_state, path, cost) = queue.pop()
-        if problem.isGoalState(current_state):
+    return runSearch(bestFirstSearch, problem, stats,
+                     lambda state, cost: cost + heuristic(state, problem))
+
+def bidirectionalSearch(problem, stats=None):
+    """
+    Breadth first search run from the start state and, using the problem's
+    predecessors, from its goal state at the same time.  Each step expands
+    a whole layer of the smaller frontier; the search stops at the end of
+    the first layer in which the two searches meet, using the meeting state
+    with the fewest total steps.  Like breadthFirstSearch, it returns a
+    shortest path in number of actions.
+
+    The problem must define getGoalState and getPredecessors.
+    """
+    return runSearch(bidirectionalBFS, problem, stats)
+
+def bidirectionalBFS(problem, stats):
+    "The search behind bidirectionalSearch."
+    start, goal = problem.getStartState(), problem.getGoalState()
+    forward, backward = {start: (None, None)}, {goal: (None, None)}
+    forwardDepth, backwardDepth = {start: 0}, {goal: 0}
+    forwardLayer, backwardLayer = [start], [goal]
+    meet = start if start == goal else None
+
+    while meet is None and forwardLayer and backwardLayer:
+        stats.noteFrontier(len(forwardLayer) + len(backwardLayer))
+        if len(forwardLayer) <= len(backwardLayer):
+            forwardLayer, meet = expandLayer(forwardLayer, problem.getSuccessors,
+                                             forward, forwardDepth, backwardDepth, stats)
+        else:
+            backwardLayer, meet = expandLayer(backwardLayer, problem.getPredecessors,
+                                              backward, backwardDepth, forwardDepth, stats)
+    if meet is None:
+        return []
+
+    problem.isGoalState(goal) # Lets the problem draw its expanded cells
+    return reconstructPath(forward, meet) + reconstructSuffix(backward, meet)
+
+def expandLayer(layer, expand, links, depths, otherDepths, stats):
+    """
+    Expands every state of one BFS layer for bidirectionalSearch.  Returns the
+    next layer and the best state in which this side met the other one (None
+    if they have not met yet).
+    """
+    nextLayer = []
+    meet, meetDepth = None, None
+    for state in layer:
+        for neighbor, action, _ in expand(state):
+            if neighbor in links:
+                stats.duplicates += 1
+                continue
+            links[neighbor] = (state, action)
+            depths[neighbor] = depths[state] + 1
+            nextLayer.append(neighbor)
+            if neighbor in otherDepths:
+                total = depths[neighbor] + otherDepths[neighbor]
+                if meet is None or total < meetDepth:
+                    meet, meetDepth = neighbor, total
+    return nextLayer, meet
+
+class HalfSearch:
+    "One direction of a bidirectionalAStarSearch."
+
+    def __init__(self, problem, heuristic, stats):
+        self.problem = problem
+        self.heuristic = heuristic
+        root = problem.getStartState()
+        self.frontier = stats.trackFrontier(util.IndexedPriorityQueue())
+        self.frontier.push(root, heuristic(root, problem))
+        self.costs = {root: 0}
+        self.links = {root: (None, None)}
+
+    def relax(self, state, neighbor, action, cost):
+        "Records a path to neighbor if it is cheaper than the best known one"
+        if cost >= self.costs.get(neighbor, float('inf')):
+            return False
+        self.costs[neighbor] = cost
+        self.links[neighbor] = (state, action)
+        self.frontier.update(neighbor, cost + self.heuristic(neighbor, self.problem))
+        return True
+
+def bidirectionalAStarSearch(problem, heuristic=nullHeuristic, stats=None):
+    """
+    Front-to-end bidirectional A*: one A* search runs forward towards the goal
+    and one runs backward towards the start, each guided by the heuristic
+    estimate to its own target (the backward search hands the heuristic a
+    ReversedSearchProblem, whose goal is the start state).  The side with the
+    smaller frontier is expanded; the search stops once the best path found
+    through a meeting state costs no more than the smallest f-value on either
+    frontier, so paths are optimal for admissible heuristics.
+
+    The problem must define getGoalState and getPredecessors.
+    """
+    return runSearch(bidirectionalAStar, problem, stats, heuristic)
+
+def bidirectionalAStar(problem, heuristic, stats):
+    "The search behind bidirectionalAStarSearch."
+    heuristic = stats.timed(heuristic, 'heuristicTime')
+    forward = HalfSearch(problem, heuristic, stats)
+    backward = HalfSearch(ReversedSearchProblem(problem), heuristic, stats)
+    start = problem.getStartState()
+    best, meet = float('inf'), None
+    if start in backward.costs:
+        best, meet = 0, start
+
+    while not (forward.frontier.isEmpty() or backward.frontier.isEmpty()):
+        if best <= max(forward.frontier.topPriority(), backward.frontier.topPriority()):
+            break
+        if len(forward.frontier) <= len(backward.frontier):
+            half, other = forward, backward
+        else:
+            half, other = backward, forward
+        state = half.frontier.pop()
+        cost = half.costs[state]
+        for neighbor, action, stepCost in half.problem.getSuccessors(state):
+            if not half.relax(state, neighbor, action, cost + stepCost):
+                stats.duplicates += 1
+            elif neighbor in other.costs:
+                total = half.costs[neighbor] + other.costs[neighbor]
+                if total < best:
+                    best, meet = total, neighbor
+    if meet is None:
+        return []
+
+    problem.isGoalState(problem.getGoalState()) # Lets the problem draw its expanded cells
+    return reconstructPath(forward.links, meet) + reconstructSuffix(backward.links, meet)
+
+def weightedAStarSearch(problem, heuristic=nullHeuristic, weight=2, stats=None):
+    """
+    A* with the heuristic multiplied by weight >= 1.  Expands fewer nodes than
+    aStarSearch; with an admissible heuristic the returned path costs at most
+    weight times the optimal cost.
+    """
+    weight = float(weight)
+    return runSearch(bestFirstSearch, problem, stats,
+                     lambda state, cost: cost + weight * heuristic(state, problem))
+
+def greedyBestFirstSearch(problem, heuristic=nullHeuristic, stats=None):
+    """
+    Search the node with the lowest heuristic value first, ignoring the cost
+    of reaching it.  Fast, but gives no guarantee on the cost of the path.
+    """
+    return runSearch(bestFirstSearch, problem, stats, lambda state, cost: heuristic(state, problem))
+
+def anytimeRepairingAStarSearch(problem, heuristic=nullHeuristic, weight=3, decrement=0.5, deadline=None,
+                                stats=None):
+    """
+    Anytime Repairing A* (ARA*): a series of weighted A* searches with the
+    weight lowered by decrement after every solution, down to 1.  Each search
+    reuses the costs found by the previous ones, only reopening states whose
+    cost improved.  Returns the best path found once weight 1 is reached
+    or, if deadline (in seconds) is given, once the deadline has passed and
+    at least one path has been found.  See araStarSolutions for the
+    individual solutions.
+    """
+    stopTime = None if deadline is None else time.time() + float(deadline)
+    return runSearch(lastSolution, problem, stats, heuristic, weight, decrement, stopTime)
+
+def lastSolution(problem, heuristic, weight, decrement, stopTime, stats):
+    "The search behind anytimeRepairingAStarSearch."
+    path = []
+    for path, _, _ in araStarSolutions(problem, heuristic, weight, decrement, stopTime, stats):
+        if stopTime is not None and time.time() >= stopTime:
+            break
+    return path
+
+def araStarSolutions(problem, heuristic=nullHeuristic, weight=3, decrement=0.5, stopTime=None, stats=None):
+    """
+    Generator behind anytimeRepairingAStarSearch.  Yields (path, cost, bound)
+    for each successive solution, where bound >= 1 is a proven limit on the
+    ratio between cost and the optimal cost when the heuristic is admissible.
+    Once a solution is known, a search stops early when time.time() passes
+    stopTime.  Unlike the search functions, it does not wrap the problem for
+    stats (runSearch does that for anytimeRepairingAStarSearch).
+    """
+    if stats is None:
+        stats = SearchStats(enabled=False)
+    weight, decrement = float(weight), float(decrement)
+    heuristic = stats.timed(heuristic, 'heuristicTime')
+    start = problem.getStartState()
+    costs = {start: 0}
+    parents = {start: (None, None)}
+    priority = lambda state: costs[state] + weight * heuristic(state, problem)
+    frontier = stats.trackFrontier(util.IndexedPriorityQueue())
+    frontier.push(start, priority(start))
+    goal = None
+
+    while True:
+        closed, inconsistent = set(), set()
+        while not frontier.isEmpty():
+            if goal is not None and (costs[goal] <= frontier.topPriority() or
+                                     (stopTime is not None and time.time() >= stopTime)):
+                break
+            state = frontier.pop()
+            closed.add(state)
+            if problem.isGoalState(state):
+                if goal is None or costs[state] < costs[goal]:
+                    goal = state
+                continue
+            cost = costs[state]
+            for suc, action, stepCost in problem.getSuccessors(state):
+                sucCost = cost + stepCost
+                if sucCost >= costs.get(suc, float('inf')):
+                    stats.duplicates += 1
+                    continue
+                costs[suc] = sucCost
+                parents[suc] = (state, action)
+                if suc in closed:
+                    inconsistent.add(suc)
+                else:
+                    frontier.update(suc, priority(suc))
+        if goal is None:
+            return
+
+        # Reopen the states whose cost improved after they were closed
+        pending = set(frontier) | inconsistent
+        bound = 1.0
+        if pending:
+            lowerBound = min([costs[s] + heuristic(s, problem) for s in pending])
+            if lowerBound > 0:
+                bound = max(1.0, min(weight, float(costs[goal]) / lowerBound))
+            else:
+                bound = weight
+        yield reconstructPath(parents, goal), costs[goal], bound
+        if weight <= 1 or not pending:
+            return
+        weight = max(1.0, weight - decrement)
+        for state in pending:
+            frontier.push(state, priority(state)) # Supersedes the old priority
+
+def idaStarSearch(problem, heuristic=nullHeuristic, tableSize=100000, stats=None):
+    """
+    Iterative-deepening A*: a series of depth first searches, each bounded by
+    a limit on cost + heuristic that starts at the heuristic value of the
+    start state and rises to the smallest value that exceeded it in the
+    previous iteration.  Only the current path is kept, so memory grows with
+    the depth of the solution, and the returned path is optimal if the
+    heuristic is admissible.
+
+    tableSize bounds an LRU transposition table of the cheapest cost at which
+    each state was reached in the current iteration; reaching a state again
+    at no lower cost prunes it.  Use tableSize=0 to disable the table.
+    """
+    return runSearch(iterativeDeepeningAStar, problem, stats, heuristic, tableSize)
+
+def iterativeDeepeningAStar(problem, heuristic, tableSize, stats):
+    "The search behind idaStarSearch."
+    heuristic = stats.timed(heuristic, 'heuristicTime')
+    bound = heuristic(problem.getStartState(), problem)
+    while True:
+        table = util.LRUCache(int(tableSize)) if int(tableSize) > 0 else None
+        path, bound = costBoundedSearch(problem, heuristic, bound, table, stats)
+        if path is not None:
             return path
+        if bound == float('inf'):
+            return []
 
-        if current_state not in visited:
-            visited.append(current_state)
-            for suc, action, c in problem.getSuccessors(current_state):
-                suc_cost = cost + c
-                h = heuristic(suc, problem)
-                queue.update((suc, path + [action], suc_cost), suc_cost + h)
-    return []
+def costBoundedSearch(problem, heuristic, bound, table, stats):
+    """
+    One iteration of idaStarSearch.  Returns (path, bound) if a goal was found
+    within the bound and (None, nextBound) otherwise, where nextBound is the
+    smallest cost + heuristic that exceeded the bound.
+    """
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        return [], bound
+    if table is not None:
+        table.put(start, 0)
+    nextBound = float('inf')
+    states, actions, costs = [start], [], [0]
+    onPath = set(states)
+    branches = [iter(problem.getSuccessors(start))]
+
+    while branches:
+        try:
+            suc, action, stepCost = next(branches[-1])
+        except StopIteration:
+            branches.pop()
+            onPath.discard(states.pop())
+            costs.pop()
+            if actions:
+                actions.pop()
+            continue
+        if suc in onPath:
+            stats.duplicates += 1
+            continue
+        cost = costs[-1] + stepCost
+        f = cost + heuristic(suc, problem)
+        if f > bound:
+            nextBound = min(nextBound, f)
+            continue
+        if table is not None:
+            seen = table.get(suc)
+            if seen is not None and seen <= cost:
+                stats.duplicates += 1
+                continue
+            table.put(suc, cost)
+        if problem.isGoalState(suc):
+            return actions + [action], bound
+
+        states.append(suc)
+        actions.append(action)
+        costs.append(cost)
+        onPath.add(suc)
+        stats.noteFrontier(len(states))
+        branches.append(iter(problem.getSuccessors(suc)))
+    return None, nextBound
 
 
 # Abbreviations
@@ -181,3 +851,9 @@ bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+bibfs = bidirectionalSearch
+biastar = bidirectionalAStarSearch
+idastar = idaStarSearch
+wastar = weightedAStarSearch
+greedy = greedyBestFirstSearch
+arastar = anytimeRepairingAStarSearch
@@ -37,13 +37,17 @@ Good luck and happy searching!
 from game import Directions
 from game import Agent
 from game import Actions
+from game import CellIndex
+from game import FoodBitset
 import util
 import time
 import search
 import numpy as np
+from mazeDistances import getMazeDistanceTable
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
+    readOnlyObservations = True
 
     def getAction(self, state):
         "The agent receives a GameState (defined in pacman.py)."
@@ -69,21 +73,61 @@ class SearchAgent(Agent):
     Options for fn include:
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
+      bidirectionalSearch or bibfs (problems with getPredecessors)
+      bidirectionalAStarSearch or biastar (problems with getPredecessors)
+      idaStarSearch or idastar
+      weightedAStarSearch or wastar
+      greedyBestFirstSearch or greedy
+      anytimeRepairingAStarSearch or arastar
+
+    Any other agent argument is passed on to the search function as a keyword
+    argument, e.g. -a fn=wastar,heuristic=manhattanHeuristic,weight=2
+
+    With -a stats the agent collects a search.SearchStats and prints it after
+    the search; -a stats=FILE.json writes it to FILE.json instead.
+
+    With -a cache=SIZE the problem is wrapped in a search.CachedSearchProblem
+    that memoizes the successors and goal tests of up to SIZE states.
 
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def readOnlyObservations(self):
+        # Only the agents in READ_ONLY_SEARCH_AGENTS are known never to change the states they
+        # observe, so only they get the live game state.  Other subclasses get a copy, unless
+        # they set readOnlyObservations = True themselves.
+        return self.__class__ in READ_ONLY_SEARCH_AGENTS
+    readOnlyObservations = property(readOnlyObservations)
+
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic',
+                 stats=None, cache=None, **searchArgs):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
         # Get the search function from the name and heuristic
         if fn not in dir(search):
             raise AttributeError, fn + ' is not a search function in search.py.'
         func = getattr(search, fn)
+        for arg in searchArgs:
+            if arg not in func.func_code.co_varnames[:func.func_code.co_argcount]:
+                raise AttributeError, arg + ' is not an argument of ' + fn + ' in search.py.'
+        if searchArgs:
+            print('[SearchAgent] using search arguments ' +
+                  ', '.join('%s=%s' % item for item in sorted(searchArgs.items())))
+        self.cacheSize = cache
+        self.searchStats, self.statsFile = None, None
+        if stats is not None:
+            if 'stats' not in func.func_code.co_varnames[:func.func_code.co_argcount]:
+                raise AttributeError, fn + ' does not collect search statistics.'
+            self.searchStats = searchArgs['stats'] = search.SearchStats()
+            if str(stats).endswith('.json'):
+                self.statsFile = stats
         if 'heuristic' not in func.func_code.co_varnames:
             print('[SearchAgent] using function ' + fn)
-            self.searchFunction = func
+            if searchArgs:
+                self.searchFunction = lambda x: func(x, **searchArgs)
+            else:
+                self.searchFunction = func
         else:
             if heuristic in globals().keys():
                 heur = globals()[heuristic]
@@ -93,7 +137,7 @@ class SearchAgent(Agent):
                 raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            self.searchFunction = lambda x: func(x, heuristic=heur, **searchArgs)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -111,12 +155,31 @@ class SearchAgent(Agent):
         state: a GameState object (pacman.py)
         """
         if self.searchFunction == None: raise Exception, "No search function provided for SearchAgent"
+        searchStats = getattr(self, 'searchStats', None)
+        if searchStats != None: searchStats.reset()
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
-        self.actions  = self.searchFunction(problem) # Find a path
+        cacheSize = getattr(self, 'cacheSize', None)
+        if cacheSize != None:
+            cachedProblem = search.CachedSearchProblem(problem, cacheSize)
+            self.actions = self.searchFunction(cachedProblem) # Find a path
+        else:
+            self.actions  = self.searchFunction(problem) # Find a path
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if cacheSize != None: print('Search cache: ' + cachedProblem.cacheReport())
+        if searchStats != None: self.reportSearchStats(searchStats)
+
+    def reportSearchStats(self, searchStats):
+        "Prints the search statistics, or writes them as JSON if asked to"
+        if self.statsFile == None:
+            print(searchStats)
+            return
+        f = open(self.statsFile, 'w')
+        try: f.write(searchStats.toJson() + '\n')
+        finally: f.close()
+        print('Search statistics written to ' + self.statsFile)
 
     def getAction(self, state):
         """
@@ -211,6 +274,32 @@ class PositionSearchProblem(search.SearchProblem):
 
         return successors
 
+    def getGoalState(self):
+        return self.goal
+
+    def getPredecessors(self, state):
+        """
+        Returns predecessor states, the actions that lead from them to state,
+        and the cost of stepping into state.  Used by the bidirectional
+        searches; counts as an expansion like getSuccessors.
+        """
+        predecessors = []
+        cost = self.costFn(state)
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+            x,y = state
+            dx, dy = Actions.directionToVector(action)
+            prevx, prevy = int(x - dx), int(y - dy)
+            if not self.walls[prevx][prevy]:
+                predecessors.append( ( (prevx, prevy), action, cost) )
+
+        # Bookkeeping for display purposes
+        self._expanded += 1
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return predecessors
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions. If those actions
@@ -280,6 +369,7 @@ class CornersProblem(search.SearchProblem):
         """
         self.walls = startingGameState.getWalls()
         self.startingPosition = startingGameState.getPacmanPosition()
+        self.startingGameState = startingGameState
         top, right = self.walls.height-2, self.walls.width-2
         self.corners = ((1,1), (1,top), (right, 1), (right, top))
         for corner in self.corners:
@@ -288,6 +378,7 @@ class CornersProblem(search.SearchProblem):
         self._expanded = 0 # DO NOT CHANGE; Number of search nodes expanded
         # Please add any code here which you would like to use
         # in initializing the problem
+        self.heuristicInfo = {} # A dictionary for the heuristic to store information
 
     def getStartState(self):
         """
@@ -342,6 +433,7 @@ class CornersProblem(search.SearchProblem):
             dx, dy = Actions.directionToVector(action)
             x, y = int(x + dx), int(y + dy)
             if self.walls[x][y]: return 999999
+        return len(actions)
 
 def distance(p0, p1):
     x0, y0 = p0
@@ -370,7 +462,10 @@ def cornersHeuristic(state, problem):
     if problem.isGoalState(state):
         return 0
 
-    return max([distance(corner, pos) for corner in visited])
+    if 'mazeDistances' not in problem.heuristicInfo:
+        problem.heuristicInfo['mazeDistances'] = getMazeDistanceTable(problem.startingGameState.data.layout)
+    table = problem.heuristicInfo['mazeDistances']
+    return max([table.distance(pos, corner) for corner in visited])
 
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
@@ -385,11 +480,14 @@ class FoodSearchProblem:
 
     A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
-      foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+      foodGrid:       a FoodBitset (see game.py) of the remaining food; it
+                      answers foodGrid[x][y], count() and asList() like a Grid
     """
     def __init__(self, startingGameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
         self.walls = startingGameState.getWalls()
+        self.cellIndex = CellIndex(self.walls)
+        food = FoodBitset.fromGrid(startingGameState.getFood(), self.cellIndex)
+        self.start = (startingGameState.getPacmanPosition(), food)
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
         self.heuristicInfo = {} # A dictionary for the heuristic to store information
@@ -398,7 +496,7 @@ class FoodSearchProblem:
         return self.start
 
     def isGoalState(self, state):
-        return state[1].count() == 0
+        return not state[1]
 
     def getSuccessors(self, state):
         "Returns successor states, the actions they require, and a cost of 1."
@@ -409,8 +507,7 @@ class FoodSearchProblem:
             dx, dy = Actions.directionToVector(direction)
             nextx, nexty = int(x + dx), int(y + dy)
             if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
-                nextFood[nextx][nexty] = False
+                nextFood = state[1].without((nextx, nexty))
                 successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
         return successors
 
@@ -464,7 +561,10 @@ def foodHeuristic(state, problem):
     """
 
     position, foodGrid = state
-    return max([0]+[mazeDistance(position, foodCoord, problem.startingGameState) for foodCoord in foodGrid.asList()])
+    if 'mazeDistances' not in problem.heuristicInfo:
+        problem.heuristicInfo['mazeDistances'] = getMazeDistanceTable(problem.startingGameState.data.layout)
+    table = problem.heuristicInfo['mazeDistances']
+    return max([0]+[table.distance(position, foodCoord) for foodCoord in foodGrid.asList()])
 
 class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
@@ -489,13 +589,15 @@ class ClosestDotSearchAgent(SearchAgent):
         gameState.
         """
         # Here are some useful elements of the startState
-        x, y = gameState.getPacmanPosition()
+        position = gameState.getPacmanPosition()
         food = gameState.getFood()
-        walls = gameState.getWalls()
-        problem = AnyFoodSearchProblem(gameState)
+        if food.count() == 0:
+            return []
+
+        return getMazeDistanceTable(gameState.data.layout).pathToClosest(position, food)
 
-        path = []
-        return search.breadthFirstSearch(problem)
+READ_ONLY_SEARCH_AGENTS = set([SearchAgent, StayEastSearchAgent, StayWestSearchAgent, AStarCornersAgent,
+                               AStarFoodSearchAgent, ClosestDotSearchAgent])
 
 class AnyFoodSearchProblem(PositionSearchProblem):
     """
@@ -534,9 +636,9 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
 def mazeDistance(point1, point2, gameState):
     """
-    Returns the maze distance between any two points, using the search functions
-    you have already built. The gameState can be any game state -- Pacman's
-    position in that state is ignored.
+    Returns the maze distance between any two points, looked up in the
+    MazeDistanceTable shared by every caller on the same walls. The gameState
+    can be any game state -- Pacman's position in that state is ignored.
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
@@ -547,5 +649,4 @@ def mazeDistance(point1, point2, gameState):
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    return getMazeDistanceTable(gameState.data.layout).distance(point1, point2)
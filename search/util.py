@@ -29,6 +29,7 @@
 import sys
 import inspect
 import heapq, random
+import collections
 import cStringIO
 
 
@@ -140,6 +141,12 @@ class Stack:
         "Push 'item' onto the stack"
         self.list.append(item)
 
+    def pushMany(self, items):
+        "Push every item in 'items' onto the stack, in order"
+        self.list.extend(items)
+
+    extend = pushMany
+
     def pop(self):
         "Pop the most recently pushed item from the stack"
         return self.list.pop()
@@ -148,14 +155,23 @@ class Stack:
         "Returns true if the stack is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class Queue:
     "A container with a first-in-first-out (FIFO) queuing policy."
     def __init__(self):
-        self.list = []
+        self.list = collections.deque()
 
     def push(self,item):
         "Enqueue the 'item' into the queue"
-        self.list.insert(0,item)
+        self.list.appendleft(item)
+
+    def pushMany(self, items):
+        "Enqueue every item in 'items', in order"
+        self.list.extendleft(items)
+
+    extend = pushMany
 
     def pop(self):
         """
@@ -168,6 +184,9 @@ class Queue:
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+    def __len__(self):
+        return len(self.list)
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
@@ -191,6 +210,9 @@ class PriorityQueue:
     def isEmpty(self):
         return len(self.heap) == 0
 
+    def __len__(self):
+        return len(self.heap)
+
     def update(self, item, priority):
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
@@ -206,6 +228,109 @@ class PriorityQueue:
         else:
             self.push(item, priority)
 
+class IndexedPriorityQueue:
+    """
+      A priority queue that keeps an index from each item to its live heap
+      entry, so update() runs in O(log n) instead of scanning the heap.
+
+      Items must be hashable and are treated as unique keys.  Superseded
+      entries are invalidated lazily and skipped by pop().  As with
+      PriorityQueue, ties are broken FIFO on an insertion count; an item
+      whose priority improves is re-entered with a fresh count, exactly as
+      if it had been pushed again.
+    """
+    REMOVED = object()
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.count = 0
+
+    def push(self, item, priority):
+        "Adds item with the given priority, superseding any queued entry for it"
+        if item in self.entries:
+            self.entries[item][-1] = IndexedPriorityQueue.REMOVED
+        entry = [priority, self.count, item]
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+        self.count += 1
+
+    def pop(self):
+        "Removes and returns the lowest-priority item"
+        while self.heap:
+            (_, _, item) = heapq.heappop(self.heap)
+            if item is not IndexedPriorityQueue.REMOVED:
+                del self.entries[item]
+                return item
+        raise IndexError('pop from an empty priority queue')
+
+    def isEmpty(self):
+        return len(self.entries) == 0
+
+    def topPriority(self):
+        "Returns the lowest priority in the queue without removing its item"
+        while self.heap[0][-1] is IndexedPriorityQueue.REMOVED:
+            heapq.heappop(self.heap)
+        return self.heap[0][0]
+
+    def update(self, item, priority):
+        """
+          If item is queued with a higher priority, lowers its priority.  If it
+          is queued with an equal or lower priority, does nothing.  If it is not
+          queued, pushes it.  Returns True if the item was pushed or improved.
+        """
+        entry = self.entries.get(item)
+        if entry is not None and entry[0] <= priority:
+            return False
+        self.push(item, priority)
+        return True
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def __iter__(self):
+        "Iterates over the queued items, in no particular order"
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+class LRUCache:
+    """
+      A dictionary-like cache that holds at most 'capacity' items and evicts
+      the least recently used one when it is full.  Lookups through get() are
+      counted in 'hits' and 'misses'.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        "Returns the value cached for key, or default, and marks key as used"
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.data[key] = value
+        return value
+
+    def put(self, key, value):
+        "Caches value under key, evicting the least recently used key if full"
+        self.data.pop(key, None)
+        self.data[key] = value
+        if len(self.data) > self.capacity:
+            self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
 class PriorityQueueWithFunction(PriorityQueue):
     """
     Implements a priority queue with the same push/pop signature of the
@@ -609,6 +734,7 @@ def pause():
 #
 import signal
 import time
+import timeit
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
@@ -643,6 +769,83 @@ class TimeoutFunction:
         return result
 
 
+clock = timeit.default_timer
+
+class AlarmTimer:
+    """
+    Runs functions under a time limit without building a TimeoutFunction
+    per call.  One SIGALRM handler is installed for the whole process and
+    each call only arms and disarms the interval timer, which also allows
+    fractional limits.  A limit set by an enclosing TimeoutFunction keeps
+    running: the timer is armed for whichever deadline comes first, an outer
+    deadline that expires during the call is passed on to the handler it
+    was set with, and otherwise its remaining time is restored when the call
+    returns.  Without SIGALRM the limit is checked after the function
+    returns.
+
+    Use getAlarmTimer() rather than building one; lastElapsed holds the
+    seconds taken by the latest call, even one that timed out.
+    """
+    def __init__(self):
+        self.useAlarm = hasattr(signal, 'SIGALRM') and hasattr(signal, 'setitimer')
+        self.armed = False
+        self.outerFirst = False  # The enclosing deadline comes before the limit of the call
+        self.outerExpired = False
+        self.handler = self._handleAlarm
+        self.previousHandler = None
+        self.lastElapsed = 0.0
+
+    def _handleAlarm(self, signum, frame):
+        if self.armed and not self.outerFirst:
+            self.armed = False
+            raise TimeoutFunctionException()
+        if self.armed:
+            self.armed = False
+            self.outerExpired = True
+        if callable(self.previousHandler):
+            self.previousHandler(signum, frame)
+
+    def call(self, timeout, function, *args):
+        """
+        Returns function(*args), raising TimeoutFunctionException if it runs
+        for timeout seconds or more.
+        """
+        self.lastElapsed = 0.0
+        if timeout <= 0:
+            raise TimeoutFunctionException()
+        start = clock()
+        if not self.useAlarm:
+            result = function(*args)
+            self.lastElapsed = clock() - start
+            if self.lastElapsed >= timeout:
+                raise TimeoutFunctionException()
+            return result
+        if signal.getsignal(signal.SIGALRM) is not self.handler:
+            self.previousHandler = signal.signal(signal.SIGALRM, self.handler)
+        outer = signal.getitimer(signal.ITIMER_REAL)[0]
+        self.outerFirst = 0 < outer < timeout
+        self.outerExpired = False
+        signal.setitimer(signal.ITIMER_REAL, outer if self.outerFirst else timeout)
+        self.armed = True
+        try:
+            return function(*args)
+        finally:
+            self.armed = False
+            self.lastElapsed = clock() - start
+            if outer > 0 and not self.outerExpired:
+                signal.setitimer(signal.ITIMER_REAL, max(outer - self.lastElapsed, 0.001))
+            else:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+
+_alarmTimer = None
+
+def getAlarmTimer():
+    "Returns the process-wide AlarmTimer"
+    global _alarmTimer
+    if _alarmTimer is None:
+        _alarmTimer = AlarmTimer()
+    return _alarmTimer
+
 
 _ORIGINAL_STDOUT = None
 _ORIGINAL_STDERR = None